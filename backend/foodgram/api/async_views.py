@@ -0,0 +1,74 @@
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import close_old_connections
+
+orm_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_ORM_WORKERS, thread_name_prefix='orm'
+)
+
+
+def call_with_connections(function, *args, **kwargs):
+    """Вызывает функцию в потоке пула, закрывая устаревшие соединения с
+    БД, как это делает Django в начале и в конце запроса."""
+    close_old_connections()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_orm_executor(function, *args, **kwargs):
+    """Выполняет блокирующий код (ORM) в ограниченном пуле потоков.
+
+    Django 3.2 выполняет синхронные представления под ASGI в одном общем
+    потоке, поэтому без пула запросы к БД шли бы строго по очереди.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        orm_executor, functools.partial(
+            context.run, call_with_connections, function, *args, **kwargs
+        )
+    )
+
+
+def render_response(view, request, *args, **kwargs):
+    """Выполняет представление и формирует тело ответа в одном потоке.
+
+    Потоковый ответ ASGI-обработчик Django 3.2 перебирает прямо в цикле
+    событий, где запросы к БД запрещены, поэтому представление читает
+    данные для него заранее, а в цикле событий только формируются части.
+    """
+    with getattr(request, 'profiler', None) or nullcontext():
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            started = time.perf_counter()
+            response.render()
+            request.render_duration = time.perf_counter() - started
+    return response
+
+
+class AsyncViewSetMixin:
+    """Асинхронные представления набора для режима ASGI.
+
+    Цикл событий не блокируется: представление DRF целиком, вместе с
+    запросами к БД и сериализацией, выполняется в пуле ORM.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_VIEWS:
+            return view
+
+        async def async_view(request, *args, **kwargs):
+            return await run_in_orm_executor(
+                render_response, view, request, *args, **kwargs
+            )
+
+        return functools.update_wrapper(async_view, view)
@@ -0,0 +1,161 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+RECIPES_GENERATION_KEY = 'recipes_cache_generation'
+TAGS_GENERATION_KEY = 'tags_cache_generation'
+RECIPES_HITS_KEY = 'recipes_cache_hits'
+RECIPES_MISSES_KEY = 'recipes_cache_misses'
+
+
+def get_generation(key):
+    """Текущее поколение данных, хранящееся в кеше без срока жизни.
+
+    Поколение - время последнего изменения в наносекундах, поэтому после
+    вытеснения ключа не повторяется и служит значением Last-Modified.
+    """
+    return cache.get_or_set(key, time.time_ns(), None)
+
+
+def bump_generation(key):
+    generation = time.time_ns()
+    cache.set(key, generation, None)
+    return generation
+
+
+def increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def invalidate_tags_cache():
+    bump_generation(TAGS_GENERATION_KEY)
+
+
+def invalidate_recipes_cache():
+    bump_generation(RECIPES_GENERATION_KEY)
+
+
+def get_recipes_cache_stats():
+    stats = cache.get_many((RECIPES_HITS_KEY, RECIPES_MISSES_KEY))
+    return {
+        'hits': stats.get(RECIPES_HITS_KEY, 0),
+        'misses': stats.get(RECIPES_MISSES_KEY, 0),
+    }
+
+
+class AnonymousResponseCacheMixin:
+    """Кеширует ответы list и retrieve для анонимных пользователей.
+
+    Ключ строится из пути, формата ответа и нормализованной строки запроса
+    и включает поколение данных, которое увеличивается при изменении
+    рецептов, поэтому устаревшие ответы просто перестают запрашиваться.
+    Часто меняющиеся поля, которые не меняют поколение, вьюсет сохраняет
+    отдельно в cache_data() и подставляет в ответ из кеша в
+    update_cached_data().
+    """
+
+    def get_cache_key(self, request):
+        query = urlencode(sorted(
+            (key, value)
+            for key in request.query_params
+            for value in sorted(set(request.query_params.getlist(key)))
+        ))
+        digest = hashlib.md5(
+            f'{request.path}|{request.accepted_renderer.format}|{query}'
+            .encode()
+        ).hexdigest()
+        generation = get_generation(RECIPES_GENERATION_KEY)
+        return f'recipes_response:{generation}:{digest}'
+
+    def cache_data(self, key, data):
+        cache.set(key, data, settings.RECIPES_CACHE_TIMEOUT)
+
+    def update_cached_data(self, data):
+        return data
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            increment(RECIPES_HITS_KEY)
+            response = Response(self.update_cached_data(data))
+            response['X-Cache'] = 'HIT'
+            return response
+        increment(RECIPES_MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.cache_data(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 на условные GET-запросы до сериализации ответа.
+
+    Вьюсет возвращает из get_conditional_version() версию данных и время
+    их изменения, из которых строятся ETag и Last-Modified. Без времени
+    изменения ответ проверяется только по ETag. Если версия не
+    определена, запрос обрабатывается как обычно.
+    """
+    cache_control = {}
+    vary_headers = ()
+
+    def get_conditional_version(self, request):
+        return None
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        version = self.get_conditional_version(request)
+        if version is None:
+            return handler(request, *args, **kwargs)
+        data, last_modified = version
+        etag = quote_etag(hashlib.md5(
+            f'{request.get_full_path()}|{request.accepted_renderer.format}|'
+            f'{data}'.encode()
+        ).hexdigest())
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, **self.cache_control)
+        if self.vary_headers:
+            patch_vary_headers(response, self.vary_headers)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.cache import cache
+from recipes.models import Recipe
+
+RECIPE_COUNTERS_KEY = 'recipe_counters:{}'
+COUNTER_FIELDS = ('favorites_count', 'shopping_cart_count')
+
+
+def get_counters_keys(counters):
+    return {
+        RECIPE_COUNTERS_KEY.format(pk): value
+        for pk, value in counters.items()
+    }
+
+
+def cache_recipe_counters(recipe_ids):
+    """Читает счетчики рецептов из БД и сохраняет их в кеше."""
+    counters = {
+        pk: dict(zip(COUNTER_FIELDS, values))
+        for pk, *values in Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).order_by().values_list('pk', *COUNTER_FIELDS)
+    }
+    cache.set_many(get_counters_keys(counters),
+                   settings.RECIPES_CACHE_TIMEOUT)
+    return counters
+
+
+def add_recipe_counters(items):
+    """Сохраняет в кеше счетчики из сериализованных рецептов.
+
+    Значения только добавляются: счетчики, записанные после коммита
+    изменения, новее прочитанных запросом, который мог начаться раньше.
+    """
+    for key, value in get_counters_keys({
+        item['id']: {field: item[field] for field in COUNTER_FIELDS}
+        for item in items
+    }).items():
+        cache.add(key, value, settings.RECIPES_CACHE_TIMEOUT)
+
+
+def get_cached_recipe_counters(recipe_id):
+    return cache.get(RECIPE_COUNTERS_KEY.format(recipe_id))
+
+
+def get_recipe_counters(recipe_ids):
+    """Счетчики рецептов из кеша; недостающие читаются одним запросом."""
+    keys = {RECIPE_COUNTERS_KEY.format(pk): pk for pk in recipe_ids}
+    counters = {
+        keys[key]: value for key, value in cache.get_many(keys).items()
+    }
+    missing = [pk for pk in keys.values() if pk not in counters]
+    if missing:
+        counters.update(cache_recipe_counters(missing))
+    return counters
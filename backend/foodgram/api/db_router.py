@@ -0,0 +1,151 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY_STICKY_KEY = 'db_primary_sticky:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_SELECTIONS = ('round-robin', 'least-loaded')
+
+current_database = ContextVar('current_database', default=None)
+
+
+class ReplicaPool:
+    """Выбор реплики для запроса: по кругу или наименее загруженной.
+
+    Нагрузка - число запросов процесса, которые сейчас читают с реплики;
+    при равной нагрузке реплики тоже перебираются по кругу.
+    """
+
+    def __init__(self, aliases, selection):
+        if selection not in REPLICA_SELECTIONS:
+            raise ImproperlyConfigured(
+                f'DATABASE_REPLICA_SELECTION: ожидается одно из '
+                f'{", ".join(REPLICA_SELECTIONS)}, получено {selection!r}.'
+            )
+        self.aliases = tuple(aliases)
+        self.selection = selection
+        self.lock = threading.Lock()
+        self.active = dict.fromkeys(self.aliases, 0)
+        self.position = 0
+
+    def acquire(self):
+        with self.lock:
+            start = self.position % len(self.aliases)
+            self.position += 1
+            alias = self.aliases[start]
+            if self.selection == 'least-loaded':
+                alias = min(self.aliases[start:] + self.aliases[:start],
+                            key=self.active.__getitem__)
+            self.active[alias] += 1
+        return alias
+
+    def release(self, alias):
+        with self.lock:
+            self.active[alias] -= 1
+
+
+replica_pool = ReplicaPool(
+    (alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS),
+    settings.DATABASE_REPLICA_SELECTION
+)
+
+
+def is_sticky(user):
+    return cache.get(PRIMARY_STICKY_KEY.format(user.pk)) is not None
+
+
+def stick_to_primary(user):
+    cache.set(PRIMARY_STICKY_KEY.format(user.pk), True,
+              settings.DATABASE_STICKY_SECONDS)
+
+
+@contextmanager
+def use_primary():
+    """Чтение с основной БД, например для данных, которые кешируются
+    по версии из кеша и не должны отставать от нее."""
+    token = current_database.set(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        current_database.reset(token)
+
+
+class ReplicaRouter:
+    """Направляет чтение безопасных запросов к api.views на реплики.
+
+    Реплика выбирается представлением в ReplicaReadMixin и хранится в
+    контекстной переменной, поэтому остальной код, команды и админка
+    работают с основной БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = current_database.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД.
+        return {obj1._state.db, obj2._state.db} <= set(settings.DATABASES)
+
+
+class ReplicaReadMixin:
+    """Чтение безопасных запросов с реплики.
+
+    После изменяющего запроса пользователь DATABASE_STICKY_SECONDS читает
+    с основной БД и сразу видит свои изменения, даже если реплика
+    отстает. Также недавно изменившиеся данные из generation_keys
+    читаются с основной БД всеми: иначе ответ по отставшей реплике
+    закешировался бы под новым поколением. Счетчики избранного и списка
+    покупок поколение не меняют, и после их изменения с основной БД
+    читает только сам пользователь.
+    """
+    generation_keys = ()
+
+    def get_read_database(self, request):
+        if not replica_pool.aliases or request.method not in SAFE_METHODS:
+            return None
+        if request.user.is_authenticated and is_sticky(request.user):
+            return None
+        # Поколение, которого нет в кеше, не считается недавним: иначе
+        # новый процесс первые секунды читал бы только с основной БД.
+        generations = cache.get_many(self.generation_keys).values()
+        recent = time.time_ns() - settings.DATABASE_STICKY_SECONDS * 10 ** 9
+        if max(generations, default=0) > recent:
+            return None
+        return replica_pool.acquire()
+
+    def dispatch(self, request, *args, **kwargs):
+        # Реплика освобождается и при необработанном исключении, после
+        # которого DRF не вызывает finalize_response().
+        self.read_database = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.read_database is not None:
+                current_database.reset(self.read_database_token)
+                replica_pool.release(self.read_database)
+
+    def initial(self, request, *args, **kwargs):
+        # Аутентификация по токену выполняется на основной БД.
+        read_database = self.get_read_database(request)
+        if read_database is not None:
+            self.read_database_token = current_database.set(read_database)
+            self.read_database = read_database
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (request.method not in SAFE_METHODS
+                and request.user.is_authenticated):
+            stick_to_primary(request.user)
+        response['X-Database'] = self.read_database or DEFAULT_DB_ALIAS
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,172 @@
+import heapq
+
+from api.cache import bump_generation, get_generation
+from api.db_router import use_primary
+from api.pagination import KeysetPagination
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from recipes.models import FeedItem, Recipe
+from users.models import Subscription
+
+HIGH_FOLLOWER_GENERATION_KEY = 'feed_high_follower_generation'
+HIGH_FOLLOWER_AUTHOR_KEY = 'feed_high_follower:{}:{}'
+FEED_ORDERING = ('-pub_date', '-id')
+FEED_ITEM_ORDERING = ('-pub_date', '-recipe')
+
+
+def get_high_follower_keys(authors):
+    generation = get_generation(HIGH_FOLLOWER_GENERATION_KEY)
+    return {
+        HIGH_FOLLOWER_AUTHOR_KEY.format(generation, author): author
+        for author in authors
+    }
+
+
+def get_high_follower_authors(authors):
+    """Авторы из authors, рецепты которых не рассылаются по лентам, а
+    подмешиваются при чтении.
+
+    Признак хранится отдельным ключом для каждого автора, поэтому
+    одновременные подписки на разных авторов не затирают друг друга.
+    Признаки, вытесненные из кеша, вычисляются одним запросом.
+    """
+    keys = get_high_follower_keys(authors)
+    flags = cache.get_many(keys)
+    high_follower_authors = {
+        keys[key] for key, is_high in flags.items() if is_high
+    }
+    missing = {author for key, author in keys.items() if key not in flags}
+    if missing:
+        with use_primary():
+            counted = set(Subscription.objects.filter(
+                author__in=missing
+            ).values('author').annotate(
+                followers=Count('id')
+            ).filter(
+                followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+            ).values_list('author', flat=True))
+        cache.set_many({
+            key: author in counted
+            for key, author in keys.items() if author in missing
+        }, None)
+        high_follower_authors |= counted
+    return high_follower_authors
+
+
+def reset_high_follower_authors():
+    """Сбрасывает признаки всех авторов после массового изменения
+    подписок."""
+    bump_generation(HIGH_FOLLOWER_GENERATION_KEY)
+
+
+def fan_out_recipes(recipes):
+    """Добавляет новые рецепты в ленты подписчиков их авторов."""
+    high_follower_authors = get_high_follower_authors(
+        {recipe.author_id for recipe in recipes}
+    )
+    recipes_by_author = {}
+    for recipe in recipes:
+        if recipe.author_id not in high_follower_authors:
+            recipes_by_author.setdefault(recipe.author_id, []).append(recipe)
+    if not recipes_by_author:
+        return
+    followers = Subscription.objects.filter(
+        author__in=recipes_by_author
+    ).values_list('author', 'user')
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe_id=recipe.id,
+                     author_id=author_id, pub_date=recipe.pub_date)
+            for author_id, user_id in followers.iterator()
+            for recipe in recipes_by_author[author_id]
+        ),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def backfill_feeds(author, users):
+    """Добавляет последние рецепты автора в ленты пользователей."""
+    recipes = list(Recipe.objects.filter(author=author).order_by(
+        *FEED_ORDERING
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_LIMIT])
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe_id=recipe_id,
+                     author_id=author.id, pub_date=pub_date)
+            for user_id in users
+            for recipe_id, pub_date in recipes
+        ),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def update_high_follower_author(author):
+    """Обновляет признак автора с большим числом подписчиков и
+    возвращает его.
+
+    Когда автор опускается до порога, его последние рецепты, которые
+    раньше подмешивались при чтении, рассылаются оставшимся подписчикам.
+    """
+    was_high = bool(get_high_follower_authors((author.id,)))
+    followers = Subscription.objects.filter(author=author).count()
+    is_high = followers > settings.FEED_FANOUT_MAX_FOLLOWERS
+    (key,) = get_high_follower_keys((author.id,))
+    cache.set(key, is_high, None)
+    if was_high and not is_high:
+        backfill_feeds(author, Subscription.objects.filter(
+            author=author
+        ).values_list('user', flat=True))
+    return is_high
+
+
+def subscribe_feed(user, author):
+    if not update_high_follower_author(author):
+        backfill_feeds(author, (user.id,))
+
+
+def unsubscribe_feed(user, author):
+    FeedItem.objects.filter(user=user, author=author).delete()
+    update_high_follower_author(author)
+
+
+def get_feed_rows(user, position, limit):
+    """До limit рецептов ленты после позиции курсора.
+
+    Материализованная лента сливается с рецептами авторов с большим
+    числом подписчиков; обе части читаются по индексам в порядке ленты.
+    """
+    items = FeedItem.objects.filter(user=user)
+    if position is not None:
+        items = items.filter(
+            KeysetPagination(FEED_ITEM_ORDERING).get_position_filter(position)
+        )
+    sources = [items.order_by(*FEED_ITEM_ORDERING).values_list(
+        'pub_date', 'recipe'
+    )[:limit]]
+    authors = get_high_follower_authors(Subscription.objects.filter(
+        user=user
+    ).values_list('author', flat=True))
+    if authors:
+        recipes = Recipe.objects.filter(author__in=authors)
+        if position is not None:
+            recipes = recipes.filter(
+                KeysetPagination(FEED_ORDERING).get_position_filter(
+                    position
+                )
+            )
+        sources.append(recipes.order_by(*FEED_ORDERING).values_list(
+            'pub_date', 'id'
+        )[:limit])
+    rows = []
+    seen = set()
+    for pub_date, recipe_id in heapq.merge(*sources, reverse=True):
+        if recipe_id in seen:
+            continue
+        seen.add(recipe_id)
+        rows.append(recipe_id)
+        if len(rows) == limit:
+            break
+    return rows
@@ -1,7 +1,7 @@
-from distutils.util import strtobool
-
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework
-from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from recipes.models import Favorite, Recipe, RecipeTags, ShoppingCart, Tag
+from recipes.search import search_recipes
 
 CHOICES_LIST = (
     ('0', 'False'),
@@ -10,6 +10,11 @@ CHOICES_LIST = (
 
 
 class RecipeFilter(rest_framework.FilterSet):
+    """Фильтры рецептов в виде полусоединений EXISTS.
+
+    Условия не размножают строки рецептов, поэтому не требуют DISTINCT
+    и сохраняют сортировку и дальнейшую фильтрацию queryset.
+    """
     is_favorited = rest_framework.ChoiceFilter(
         choices=CHOICES_LIST,
         method='is_favorited_method'
@@ -25,34 +30,36 @@ class RecipeFilter(rest_framework.FilterSet):
     tags = rest_framework.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='tags_method'
     )
+    search = rest_framework.CharFilter(method='search_method')
 
-    def is_favorited_method(self, queryset, name, value):
+    def filter_user_relation(self, queryset, model, value):
+        """Рецепты, которые есть или которых нет в списке пользователя."""
+        selected = value == '1'
         if self.request.user.is_anonymous:
-            return Recipe.objects.none()
-
-        favorites = Favorite.objects.filter(user=self.request.user)
-        recipes = [item.recipe.id for item in favorites]
-        new_queryset = queryset.filter(id__in=recipes)
+            return queryset.none() if selected else queryset
+        condition = Exists(model.objects.filter(
+            user=self.request.user, recipe=OuterRef('pk')
+        ))
+        return queryset.filter(condition if selected else ~condition)
 
-        if not strtobool(value):
-            return queryset.difference(new_queryset)
-
-        return queryset.filter(id__in=recipes)
+    def is_favorited_method(self, queryset, name, value):
+        return self.filter_user_relation(queryset, Favorite, value)
 
     def is_in_shopping_cart_method(self, queryset, name, value):
-        if self.request.user.is_anonymous:
-            return Recipe.objects.none()
-
-        shopping_cart = ShoppingCart.objects.filter(user=self.request.user)
-        recipes = [item.recipe.id for item in shopping_cart]
-        new_queryset = queryset.filter(id__in=recipes)
+        return self.filter_user_relation(queryset, ShoppingCart, value)
 
-        if not strtobool(value):
-            return queryset.difference(new_queryset)
+    def tags_method(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(RecipeTags.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value
+        )))
 
-        return queryset.filter(id__in=recipes)
+    def search_method(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     class Meta:
         model = Recipe
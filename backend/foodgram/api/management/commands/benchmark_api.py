@@ -0,0 +1,248 @@
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+from api.counters import cache_recipe_counters
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, SimilarRecipe, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+DEFAULT_BUDGETS = os.path.join(settings.BASE_DIR, 'benchmarks',
+                               'budgets.json')
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def get_benchmark_user():
+    user = User.objects.annotate(
+        favorites_total=Count('favorites')
+    ).order_by('-favorites_total', 'id').first()
+    if user is None:
+        raise CommandError('В базе нет пользователей.')
+    return user
+
+
+def get_benchmark_recipe():
+    """Свежий рецепт с рассчитанными похожими, избранным и корзиной.
+
+    Такой рецепт проходит по самым длинным путям эндпоинтов; если похожие
+    рецепты не рассчитаны, берется самый свежий рецепт.
+    """
+    recipes = Recipe.objects.order_by('-pub_date', '-id')
+    recipe = recipes.filter(
+        Exists(SimilarRecipe.objects.filter(recipe=OuterRef('pk'))),
+        favorites_count__gt=0, shopping_cart_count__gt=0
+    ).first() or recipes.first()
+    if recipe is None:
+        raise CommandError('В базе нет рецептов.')
+    return recipe
+
+
+def get_toggle_recipe(user):
+    """Рецепт не из избранного и корзины пользователя для замеров их
+    изменения."""
+    toggle = Recipe.objects.exclude(in_favorite__user=user).exclude(
+        in_shopping_list__user=user
+    ).order_by('id').first()
+    if toggle is None:
+        raise CommandError('У пользователя нет рецептов вне избранного '
+                           'и списка покупок.')
+    return toggle
+
+
+def restore_toggle_recipe(user, toggle):
+    """Возвращает избранное, корзину и счетчики рецепта после замеров,
+    в том числе прерванных между добавлением и удалением."""
+    with transaction.atomic():
+        Favorite.objects.filter(user=user, recipe=toggle).delete()
+        ShoppingCart.objects.filter(user=user, recipe=toggle).delete()
+        Recipe.objects.filter(pk=toggle.pk).update(
+            favorites_count=toggle.favorites_count,
+            shopping_cart_count=toggle.shopping_cart_count,
+            updated_at=toggle.updated_at
+        )
+    cache_recipe_counters((toggle.pk,))
+
+
+def get_endpoints(recipe, toggle):
+    """Сценарии замеров: имя, метод и путь для каждого эндпоинта."""
+    tag = Tag.objects.first()
+    ingredient = Ingredient.objects.first()
+    if tag is None or ingredient is None:
+        raise CommandError('В базе нет тегов или ингредиентов.')
+    pantry = ','.join(map(str, RecipeIngredients.objects.filter(
+        recipe=recipe
+    ).values_list('ingredient', flat=True)))
+    word = recipe.name.split()[0]
+    return (
+        ('recipes_list', 'get', '/api/recipes/', True),
+        ('recipes_list_anonymous', 'get', '/api/recipes/', False),
+        ('recipes_list_filtered', 'get',
+         f'/api/recipes/?tags={tag.slug}&is_favorited=1', True),
+        ('recipes_list_not_favorited', 'get',
+         '/api/recipes/?is_favorited=0', True),
+        ('recipes_list_not_favorited_cursor', 'get',
+         '/api/recipes/?is_favorited=0&cursor=', True),
+        ('recipes_list_in_shopping_cart', 'get',
+         '/api/recipes/?is_in_shopping_cart=1', True),
+        ('recipes_list_author', 'get',
+         f'/api/recipes/?author={recipe.author_id}', True),
+        ('recipes_list_cursor', 'get', '/api/recipes/?cursor=', True),
+        ('recipes_search', 'get', f'/api/recipes/?search={word}', True),
+        ('recipe_detail', 'get', f'/api/recipes/{recipe.id}/', True),
+        ('recipe_similar', 'get', f'/api/recipes/{recipe.id}/similar/',
+         True),
+        ('recipes_pantry', 'get',
+         f'/api/recipes/pantry/?ingredients={pantry}', True),
+        ('ingredients_search', 'get',
+         f'/api/ingredients/?name={ingredient.name[:3]}', True),
+        ('tags_list', 'get', '/api/tags/', True),
+        ('subscriptions', 'get',
+         '/api/users/subscriptions/?recipes_limit=3', True),
+        ('users_feed', 'get', '/api/users/feed/', True),
+        ('download_shopping_cart', 'get',
+         '/api/recipes/download_shopping_cart/?format=txt', True),
+        ('favorite_add', 'post', f'/api/recipes/{toggle.id}/favorite/', True),
+        ('favorite_remove', 'delete', f'/api/recipes/{toggle.id}/favorite/',
+         True),
+        ('shopping_cart_add', 'post',
+         f'/api/recipes/{toggle.id}/shopping_cart/', True),
+        ('shopping_cart_remove', 'delete',
+         f'/api/recipes/{toggle.id}/shopping_cart/', True),
+    )
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку (p50/p95) и число SQL-запросов основных '
+            'эндпоинтов API и сверяет их с бюджетами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--budgets', default=DEFAULT_BUDGETS)
+        parser.add_argument('--output', default='benchmark-report.json')
+        parser.add_argument(
+            '--no-budgets', action='store_true',
+            help='только записать отчет, не проверяя бюджеты'
+        )
+
+    def measure(self, client, method, path):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed * 1000, len(queries)
+
+    def run_benchmarks(self, iterations):
+        """Замеры с настоящей фиксацией изменений.
+
+        Изменения не откатываются транзакцией: иначе не выполнялась бы
+        работа после коммита (обновление счетчиков в кеше), которая тоже
+        входит в ответ. Вместо этого после замеров восстанавливается
+        состояние рецепта, который добавлялся в избранное и корзину.
+        """
+        user = get_benchmark_user()
+        recipe = get_benchmark_recipe()
+        if not recipe.similar_recipes.exists():
+            self.stdout.write(self.style.WARNING(
+                'Похожие рецепты не рассчитаны: recipe_similar замеряется '
+                'на пустом списке (build_similar_recipes).'
+            ))
+        toggle = get_toggle_recipe(user)
+        endpoints = get_endpoints(recipe, toggle)
+        token, created = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        anonymous = APIClient()
+        results = {name: [] for name, _, _, _ in endpoints}
+        try:
+            # Каждый проход выполняет все сценарии по порядку, поэтому
+            # добавление и удаление из избранного и корзины чередуются.
+            for _ in range(iterations + 1):
+                for name, method, path, authenticated in endpoints:
+                    results[name].append(self.measure(
+                        client if authenticated else anonymous, method, path
+                    ))
+        finally:
+            restore_toggle_recipe(user, toggle)
+            if created:
+                token.delete()
+        report = {}
+        for name, method, path, _ in endpoints:
+            # Первый проход прогревает кеши и не учитывается.
+            samples = results[name][1:]
+            timings = [elapsed for _, elapsed, _ in samples]
+            report[name] = {
+                'method': method.upper(),
+                'path': path,
+                'status': sorted({status for status, _, _ in samples}),
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'queries': max(queries for _, _, queries in samples),
+            }
+        return report
+
+    def check_budgets(self, report, path):
+        try:
+            with open(path, encoding='utf-8') as file:
+                budgets = json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать бюджеты: {error}')
+        violations = []
+        for name, result in report.items():
+            if any(status >= 400 for status in result['status']):
+                violations.append(f'{name}: ответ {result["status"]}')
+            budget = budgets.get(name)
+            if budget is None:
+                continue
+            for metric in ('queries', 'p50_ms', 'p95_ms'):
+                limit = budget.get(metric)
+                if limit is not None and result[metric] > limit:
+                    violations.append(
+                        f'{name}: {metric} {result[metric]} > {limit}'
+                    )
+        return violations
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if iterations < 1:
+            raise CommandError('Число повторов должно быть больше 0.')
+
+        report = self.run_benchmarks(iterations)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump({
+                'created_at': datetime.now().isoformat(),
+                'database': connection.vendor,
+                'iterations': iterations,
+                'endpoints': report,
+            }, file, ensure_ascii=False, indent=2)
+        for name, result in report.items():
+            self.stdout.write(
+                f'{name:<34} p50 {result["p50_ms"]:>8.2f} мс  '
+                f'p95 {result["p95_ms"]:>8.2f} мс  '
+                f'запросов {result["queries"]}'
+            )
+        if options['no_budgets']:
+            return
+        violations = self.check_budgets(report, options['budgets'])
+        if violations:
+            for violation in violations:
+                self.stdout.write(self.style.ERROR(violation))
+            raise CommandError(f'Превышено бюджетов: {len(violations)}.')
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
@@ -0,0 +1,200 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+
+from api.management.commands.benchmark_api import (get_benchmark_user,
+                                                   percentile)
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Ingredient, Recipe
+from rest_framework.authtoken.models import Token
+
+SERVER_START_TIMEOUT = 30
+REQUEST_TIMEOUT = 10
+SLOW_CLIENT_HEADER_INTERVAL = 0.5
+
+
+def get_paths():
+    recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+    ingredient = Ingredient.objects.first()
+    if recipe is None or ingredient is None:
+        raise CommandError('В базе нет рецептов или ингредиентов.')
+    return (
+        '/api/tags/',
+        f'/api/ingredients/?{urlencode({"name": ingredient.name[:3]})}',
+        '/api/recipes/',
+        f'/api/recipes/{recipe.id}/',
+    )
+
+
+class SlowClient(threading.Thread):
+    """Клиент, который медленно передает заголовки запроса и держит
+    соединение с сервером, как мобильный клиент на плохой сети."""
+
+    def __init__(self, port, stopped):
+        super().__init__(daemon=True)
+        self.port = port
+        self.stopped = stopped
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                with socket.create_connection(('127.0.0.1', self.port),
+                                              timeout=5) as connection:
+                    connection.sendall(
+                        b'GET /api/tags/ HTTP/1.1\r\nHost: localhost\r\n'
+                    )
+                    while not self.stopped.wait(SLOW_CLIENT_HEADER_INTERVAL):
+                        connection.sendall(b'X-Slow-Client: 1\r\n')
+            except OSError:
+                # Сервер закрыл соединение по таймауту: подключаемся снова.
+                continue
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность и хвостовые задержки API '
+            'под gunicorn в режимах WSGI и ASGI (uvicorn) при '
+            'одновременной нагрузке и медленных клиентах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=('wsgi', 'asgi'),
+                            default=('wsgi', 'asgi'))
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--slow-clients', type=int, default=2,
+            help='число соединений, медленно передающих заголовки'
+        )
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--output', default='benchmark-servers.json')
+
+    def start_server(self, mode, workers, port):
+        environment = dict(os.environ, SERVER_MODE=mode)
+        server = subprocess.Popen(
+            (sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+             '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+             '--log-level', 'warning'),
+            cwd=settings.BASE_DIR, env=environment
+        )
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Сервер {mode} не запустился.')
+            try:
+                self.request(port, '/api/tags/', {})
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'Сервер {mode} не ответил за '
+                           f'{SERVER_START_TIMEOUT} с.')
+
+    @staticmethod
+    def request(port, path, headers):
+        connection = http.client.HTTPConnection('127.0.0.1', port,
+                                                timeout=REQUEST_TIMEOUT)
+        try:
+            started = time.perf_counter()
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status, time.perf_counter() - started
+        finally:
+            connection.close()
+
+    def run_load(self, port, paths, headers, total, concurrency):
+        def send(number):
+            try:
+                return self.request(port, paths[number % len(paths)],
+                                    headers)
+            except OSError:
+                return None, None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(send, range(total)))
+        elapsed = time.perf_counter() - started
+        timings = [duration * 1000 for status, duration in results
+                   if status is not None and status < 400]
+        result = {
+            'rps': round(len(timings) / elapsed, 1),
+            'errors': total - len(timings),
+        }
+        for name, percent in (('p50_ms', 50), ('p95_ms', 95),
+                              ('p99_ms', 99), ('max_ms', 100)):
+            # Если все воркеры заняты, успешных ответов может не быть.
+            result[name] = (round(percentile(timings, percent), 2)
+                            if timings else None)
+        return result
+
+    def handle(self, *args, **options):
+        if min(options['workers'], options['concurrency'],
+               options['requests']) < 1 or options['slow_clients'] < 0:
+            raise CommandError(
+                'Параметры --workers, --concurrency и --requests должны '
+                'быть больше 0.'
+            )
+        backend = settings.CACHES['default']['BACKEND']
+        if options['workers'] > 1 and backend.endswith('.LocMemCache'):
+            raise CommandError(
+                'LocMemCache не общий для воркеров: задайте CACHE_BACKEND '
+                '(например, memcached) или укажите --workers 1.'
+            )
+        token, _ = Token.objects.get_or_create(user=get_benchmark_user())
+        headers = {'Authorization': f'Token {token.key}'}
+        paths = get_paths()
+        port = options['port']
+
+        report = {}
+        for mode in options['modes']:
+            server = self.start_server(mode, options['workers'], port)
+            stopped = threading.Event()
+            clients = [SlowClient(port, stopped)
+                       for _ in range(options['slow_clients'])]
+            try:
+                for client in clients:
+                    client.start()
+                # Прогрев: индексы в памяти и соединения с БД.
+                self.run_load(port, paths, headers, options['concurrency'],
+                              options['concurrency'])
+                report[mode] = self.run_load(
+                    port, paths, headers, options['requests'],
+                    options['concurrency']
+                )
+            finally:
+                stopped.set()
+                server.terminate()
+                server.wait()
+                for client in clients:
+                    client.join()
+            result = report[mode]
+            latencies = '  '.join(
+                f'{name[:-3]} {result[name] or "-":>8} мс'
+                for name in ('p50_ms', 'p95_ms', 'p99_ms')
+            )
+            self.stdout.write(
+                f'{mode:<5} {result["rps"]:>8.1f} зап/с  {latencies}  '
+                f'ошибок {result["errors"]}'
+            )
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump({
+                'created_at': datetime.now().isoformat(),
+                'database': settings.DATABASES['default']['ENGINE'],
+                'workers': options['workers'],
+                'concurrency': options['concurrency'],
+                'slow_clients': options['slow_clients'],
+                'paths': paths,
+                'modes': report,
+            }, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчет сохранен в {options["output"]}.'
+        ))
@@ -0,0 +1,209 @@
+import heapq
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+METRICS_WORKER_KEY = 'metrics_worker:{}'
+# Снимок умершего процесса удаляется из кеша через несколько интервалов.
+METRICS_WORKER_TIMEOUT_FACTOR = 4
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Время обработки запроса.', DURATION_BUCKETS
+    ),
+    'foodgram_request_db_duration_seconds': (
+        'Время SQL-запросов за запрос.', DURATION_BUCKETS
+    ),
+    'foodgram_request_serialize_duration_seconds': (
+        'Время сериализации данных ответа.', DURATION_BUCKETS
+    ),
+    'foodgram_request_render_duration_seconds': (
+        'Время рендеринга тела ответа.', DURATION_BUCKETS
+    ),
+    'foodgram_request_db_queries': (
+        'Число SQL-запросов за запрос.', QUERY_BUCKETS
+    ),
+}
+REQUESTS_TOTAL = 'foodgram_requests_total'
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class QueryRecorder:
+    """Обертка выполнения SQL: считает запросы, их суммарное время и
+    хранит самые долгие. Также накапливает время сериализации ответа."""
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0
+        self.heaviest = []
+        self.serialize_duration = 0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if len(self.heaviest) < self.keep:
+                heapq.heappush(self.heaviest, (duration, self.count, sql))
+            elif duration > self.heaviest[0][0]:
+                heapq.heapreplace(self.heaviest, (duration, self.count, sql))
+
+    def get_heaviest(self):
+        return sorted(self.heaviest, reverse=True)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обертка, постоянно установленная на соединениях с БД.
+
+    Запрос учитывается счетчиком текущего HTTP-запроса из контекста,
+    поэтому учет работает и в потоках пула при асинхронной обработке.
+    """
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+class MetricsRegistry:
+    """Гистограммы запросов в памяти процесса.
+
+    Запись не обращается к кешу: процесс периодически сохраняет снимок
+    своих счетчиков, а эндпоинт метрик суммирует снимки всех процессов.
+    Снимок хранится в одном из METRICS_MAX_WORKERS слотов, который процесс
+    занимает через cache.add(); слот умершего процесса освобождается
+    по истечении срока жизни, и общего списка процессов нет.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.slot = None
+        self.flushed_at = time.monotonic()
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [0] * (len(buckets) + 2)
+        histogram[bisect_left(buckets, value)] += 1
+        histogram[-1] += value
+
+    def record(self, view, method, status, duration, db_duration, queries,
+               serialize, render):
+        labels = (('view', view), ('method', method))
+        with self.lock:
+            self.observe('foodgram_request_duration_seconds', labels,
+                         duration)
+            self.observe('foodgram_request_db_duration_seconds', labels,
+                         db_duration)
+            self.observe('foodgram_request_serialize_duration_seconds',
+                         labels, serialize)
+            self.observe('foodgram_request_render_duration_seconds', labels,
+                         render)
+            self.observe('foodgram_request_db_queries', labels, queries)
+            key = (REQUESTS_TOTAL, labels + (('status', str(status)),))
+            self.counters[key] = self.counters.get(key, 0) + 1
+        elapsed = time.monotonic() - self.flushed_at
+        if elapsed > settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return (
+                {key: list(value) for key, value in self.histograms.items()},
+                dict(self.counters),
+            )
+
+    def flush(self):
+        self.flushed_at = time.monotonic()
+        timeout = settings.METRICS_FLUSH_INTERVAL * (
+            METRICS_WORKER_TIMEOUT_FACTOR
+        )
+        value = (self.worker, self.snapshot())
+        if self.slot is not None:
+            key = METRICS_WORKER_KEY.format(self.slot)
+            owner = cache.get(key)
+            if owner is not None and owner[0] == self.worker:
+                cache.set(key, value, timeout)
+                return
+        # Слот еще не занят или истек и, возможно, достался другому
+        # процессу: занимается первый свободный.
+        self.slot = None
+        for slot in range(settings.METRICS_MAX_WORKERS):
+            if cache.add(METRICS_WORKER_KEY.format(slot), value, timeout):
+                self.slot = slot
+                return
+
+    def collect(self):
+        """Сумма снимков всех живых процессов."""
+        self.flush()
+        snapshots = cache.get_many([
+            METRICS_WORKER_KEY.format(slot)
+            for slot in range(settings.METRICS_MAX_WORKERS)
+        ])
+        histograms = {}
+        counters = {}
+        for _, (worker_histograms, worker_counters) in snapshots.values():
+            for key, values in worker_histograms.items():
+                total = histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+            for key, value in worker_counters.items():
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        histograms, counters = self.collect()
+        lines = []
+        for name, (description, buckets) in HISTOGRAMS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip((*buckets, '+Inf'), values):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket'
+                        f'{format_labels(labels + (("le", str(bound)),))} '
+                        f'{cumulative}'
+                    )
+                lines.append(f'{name}_sum{format_labels(labels)} {values[-1]}')
+                lines.append(
+                    f'{name}_count{format_labels(labels)} {cumulative}'
+                )
+        lines.append(f'# HELP {REQUESTS_TOTAL} Число обработанных запросов.')
+        lines.append(f'# TYPE {REQUESTS_TOTAL} counter')
+        for (_, labels), value in sorted(counters.items()):
+            lines.append(f'{REQUESTS_TOTAL}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name, value.replace('\\', r'\\').replace('"', r'\"')
+        )
+        for name, value in labels
+    ) + '}'
+
+
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+
+from api.async_views import run_in_orm_executor
+from api.metrics import QueryRecorder, current_recorder, metrics_registry
+from api.profiling import RequestProfiler
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+logger = logging.getLogger(__name__)
+
+PROFILING_HEADER = 'X-Profile'
+PROFILING_PARAM = 'profile'
+
+
+def get_view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else 'unmatched'
+
+
+class AsyncCapableMiddleware(ABC):
+    """Middleware, работающее и под WSGI, и под ASGI.
+
+    Как и в MiddlewareMixin, режим выбирается по get_response: под ASGI
+    вызывается __acall__, и поток не занимается на весь запрос.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.handle(request)
+
+    @abstractmethod
+    def handle(self, request):
+        """Обработка запроса под WSGI."""
+
+    @abstractmethod
+    async def __acall__(self, request):
+        """Обработка запроса под ASGI."""
+
+
+class RequestMetricsMiddleware(AsyncCapableMiddleware):
+    """Считает SQL-запросы, время БД, сериализации и рендеринга ответа
+    каждого запроса.
+
+    Значения передаются клиенту в заголовке Server-Timing, попадают
+    в гистограммы /api/metrics/, а медленные запросы пишутся в лог
+    вместе с самыми долгими SQL-запросами.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if asyncio.iscoroutinefunction(get_response):
+            # Под ASGI синхронные хуки выполняются в общем потоке Django.
+            self.process_template_response = (
+                self.process_template_response_async
+            )
+
+    def start(self, request):
+        request.render_duration = 0
+        recorder = QueryRecorder(settings.SLOW_REQUEST_QUERIES)
+        return recorder, current_recorder.set(recorder), time.perf_counter()
+
+    def handle(self, request):
+        recorder, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        recorder, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    def finish(self, request, response, recorder, started):
+        duration = time.perf_counter() - started
+        view = get_view_name(request)
+        render = request.render_duration
+        serialize = recorder.serialize_duration
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={recorder.duration * 1000:.2f};'
+            f'desc="{recorder.count} queries"',
+            f'serialize;dur={serialize * 1000:.2f}',
+            f'render;dur={render * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+        ))
+        metrics_registry.record(
+            view, request.method, response.status_code, duration,
+            recorder.duration, recorder.count, serialize, render
+        )
+        if duration * 1000 >= settings.SLOW_REQUEST_MS:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL-запросов %d '
+                'за %.0f мс, сериализация %.0f мс, рендеринг %.0f мс.%s',
+                request.method, request.get_full_path(), view,
+                duration * 1000, recorder.count, recorder.duration * 1000,
+                serialize * 1000, render * 1000, ''.join(
+                    f'\n  {query_duration * 1000:.1f} мс: {sql}'
+                    for query_duration, _, sql in recorder.get_heaviest()
+                )
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся после всех process_template_response;
+        # middleware стоит первым и вызывается последним перед рендером.
+        # Асинхронные представления рендерят ответ сами и учитывают время.
+        if response.is_rendered:
+            return response
+        started = time.perf_counter()
+
+        def finish(response):
+            request.render_duration = time.perf_counter() - started
+
+        response.add_post_render_callback(finish)
+        return response
+
+    async def process_template_response_async(self, request, response):
+        return RequestMetricsMiddleware.process_template_response(
+            self, request, response
+        )
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """Профилирует запросы сотрудников с заголовком X-Profile: 1 или
+    параметром ?profile=1, а также долю PROFILING_SAMPLE_RATE всех
+    запросов. Имя сохраненного профиля возвращается в X-Profile-Id.
+
+    Под ASGI профилируются асинхронные представления: профилировщик
+    работает в потоке пула, где выполняется представление.
+    """
+
+    @staticmethod
+    def is_staff(request):
+        user = request.user
+        if not user.is_authenticated:
+            # Токен API проверяется здесь, потому что DRF аутентифицирует
+            # пользователя только внутри представления.
+            try:
+                credentials = TokenAuthentication().authenticate(request)
+            except AuthenticationFailed:
+                return False
+            if credentials is None:
+                return False
+            user = credentials[0]
+        return user.is_staff or user.is_superuser
+
+    @staticmethod
+    def is_requested(request):
+        return (request.headers.get(PROFILING_HEADER) == '1'
+                or request.GET.get(PROFILING_PARAM) == '1')
+
+    @staticmethod
+    def is_sampled():
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def handle(self, request):
+        if not (self.is_requested(request) and self.is_staff(request)
+                or self.is_sampled()):
+            return self.get_response(request)
+        with RequestProfiler() as profiler:
+            response = self.get_response(request)
+            if response.streaming:
+                # Потоковый ответ формируется уже после middleware,
+                # поэтому при профилировании он собирается целиком.
+                response.streaming_content = list(response.streaming_content)
+        response['X-Profile-Id'] = profiler.save(
+            request, get_view_name(request)
+        )
+        return response
+
+    async def __acall__(self, request):
+        if not (self.is_requested(request)
+                and await run_in_orm_executor(self.is_staff, request)
+                or self.is_sampled()):
+            return await self.get_response(request)
+        request.profiler = profiler = RequestProfiler()
+        response = await self.get_response(request)
+        if profiler.duration is not None:
+            response['X-Profile-Id'] = await run_in_orm_executor(
+                profiler.save, request, get_view_name(request)
+            )
+        return response
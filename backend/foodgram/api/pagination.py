@@ -1,7 +1,147 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 20
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу сортировки с непрозрачным курсором.
+
+    Следующая страница выбирается условием по значениям ключа последней
+    записи, поэтому не требует OFFSET и COUNT(*).
+    """
+    page_size = CustomPageNumberPagination.page_size
+    page_size_query_param = CustomPageNumberPagination.page_size_query_param
+    max_page_size = CustomPageNumberPagination.max_page_size
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+        self.fields = tuple(field.lstrip('-') for field in ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, instance):
+        position = [
+            getattr(instance, field) for field in self.fields
+        ]
+        position = json.dumps(position, default=str).encode()
+        return base64.urlsafe_b64encode(position).decode()
+
+    def decode_cursor(self, request, model, annotations=None):
+        """Значения ключа из курсора; поля ключа, которых нет в модели,
+        ищутся среди аннотаций запроса, например оценка релевантности."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        annotations = annotations or {}
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(position) != len(self.fields):
+                raise ValueError
+            return [
+                (annotations[field].output_field if field in annotations
+                 else model._meta.get_field(field)).to_python(value)
+                for field, value in zip(self.fields, position)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_position_filter(self, position):
+        """Условие «строго после позиции» для составного ключа."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = self.ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{self.fields[0]}__{bound}': position[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model,
+                                      queryset.query.annotations)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+        return self.paginate_rows(
+            request, list(queryset[:page_size + 1]), page_size
+        )
+
+    def paginate_rows(self, request, rows, page_size):
+        """Страница из уже выбранных после курсора page_size + 1 строк."""
+        self.request = request
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class FeedPagination(CustomPageNumberPagination):
+    """Постраничная пагинация с режимом курсора по параметру cursor.
+
+    Клиент включает режим курсора запросом с пустым ?cursor= и дальше
+    переходит по ссылке next. Результаты поиска и в режиме курсора
+    сортируются прежде всего по релевантности.
+    """
+    keyset_ordering = ('-pub_date', '-id')
+    rank_ordering = ('-search_rank',)
+
+    def get_keyset_ordering(self, queryset):
+        rank = self.rank_ordering[0].lstrip('-')
+        if rank in queryset.query.annotations:
+            return self.rank_ordering + self.keyset_ordering
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(
+                self.get_keyset_ordering(queryset)
+            )
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class SubscriptionPagination(FeedPagination):
+    keyset_ordering = ('id',)
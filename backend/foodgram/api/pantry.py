@@ -0,0 +1,143 @@
+import threading
+from collections import defaultdict
+
+from api.db_router import use_primary
+from django.core.cache import cache
+from recipes.models import RecipeIngredients
+
+PANTRY_INDEX_VERSION_KEY = 'pantry_index_version'
+PANTRY_INDEX_CHANGE_KEY = 'pantry_index_change:{}'
+# Журнал изменений хранится сутки; при пропуске записи индекс
+# перестраивается целиком.
+PANTRY_INDEX_CHANGES_TIMEOUT = 24 * 60 * 60
+PANTRY_INDEX_MAX_CHANGES = 1000
+
+
+def mark_recipes_changed(recipe_ids):
+    """Записывает изменившиеся рецепты в журнал под новой версией."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    try:
+        version = cache.incr(PANTRY_INDEX_VERSION_KEY)
+    except ValueError:
+        # Версии нет в кеше: процессы заметят расхождение и перестроят
+        # индекс целиком, журнал до этой версии не нужен.
+        cache.add(PANTRY_INDEX_VERSION_KEY, 0, None)
+        version = cache.incr(PANTRY_INDEX_VERSION_KEY)
+    cache.set(PANTRY_INDEX_CHANGE_KEY.format(version), recipe_ids,
+              PANTRY_INDEX_CHANGES_TIMEOUT)
+
+
+def invalidate_pantry_index():
+    """Увеличивает версию без записи в журнал, поэтому процессы
+    перестраивают индекс целиком."""
+    try:
+        cache.incr(PANTRY_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.add(PANTRY_INDEX_VERSION_KEY, 1, None)
+
+
+class PantryIndex:
+    """Обратный индекс ингредиент -> рецепты в памяти процесса.
+
+    Индекс догоняет изменения по журналу в кеше и перечитывает только
+    изменившиеся рецепты; если журнал неполон, индекс строится заново.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.recipes = {}
+        self.postings = defaultdict(set)
+
+    def build(self, version):
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredients.objects.order_by(
+        ).values_list('recipe_id', 'ingredient_id').iterator():
+            recipes[recipe_id].add(ingredient_id)
+        postings = defaultdict(set)
+        for recipe_id, ingredients in recipes.items():
+            for ingredient_id in ingredients:
+                postings[ingredient_id].add(recipe_id)
+        self.recipes = {
+            recipe_id: frozenset(ingredients)
+            for recipe_id, ingredients in recipes.items()
+        }
+        self.postings = postings
+        self.version = version
+
+    def apply_changes(self, recipe_ids):
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredients.objects.filter(
+            recipe__in=recipe_ids
+        ).order_by().values_list('recipe_id', 'ingredient_id'):
+            recipes[recipe_id].add(ingredient_id)
+        for recipe_id in recipe_ids:
+            for ingredient_id in self.recipes.pop(recipe_id, ()):
+                self.postings[ingredient_id].discard(recipe_id)
+            ingredients = recipes.get(recipe_id)
+            if not ingredients:
+                continue
+            self.recipes[recipe_id] = frozenset(ingredients)
+            for ingredient_id in ingredients:
+                self.postings[ingredient_id].add(recipe_id)
+
+    def get_changes(self, version):
+        """Рецепты, изменившиеся после версии индекса, или None."""
+        if self.version is None or version < self.version:
+            return None
+        if version - self.version > PANTRY_INDEX_MAX_CHANGES:
+            return None
+        keys = [
+            PANTRY_INDEX_CHANGE_KEY.format(number)
+            for number in range(self.version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return None
+        return {
+            recipe_id for recipe_ids in changes.values()
+            for recipe_id in recipe_ids
+        }
+
+    def refresh(self):
+        version = cache.get_or_set(PANTRY_INDEX_VERSION_KEY, 0, None)
+        if self.version == version:
+            return
+        with self.lock, use_primary():
+            if self.version == version:
+                return
+            changes = self.get_changes(version)
+            if changes is None:
+                self.build(version)
+                return
+            self.apply_changes(changes)
+            self.version = version
+
+    def rank(self, pantry):
+        """Рецепты по доле ингредиентов, которые есть у пользователя.
+
+        Очки набираются за один проход по спискам рецептов для
+        ингредиентов пользователя; возвращаются кортежи
+        (id рецепта, доля, число найденных ингредиентов).
+        """
+        self.refresh()
+        hits = defaultdict(int)
+        with self.lock:
+            for ingredient_id in pantry:
+                for recipe_id in self.postings.get(ingredient_id, ()):
+                    hits[recipe_id] += 1
+            ranked = [
+                (recipe_id, count / len(self.recipes[recipe_id]), count)
+                for recipe_id, count in hits.items()
+            ]
+        ranked.sort(key=lambda item: (item[1], item[2], item[0]),
+                    reverse=True)
+        return ranked
+
+    def get_missing(self, recipe_id, pantry):
+        return self.recipes.get(recipe_id, frozenset()) - pantry
+
+
+pantry_index = PantryIndex()
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework import permissions
 
 
@@ -13,3 +15,18 @@ class IsAuthorOrAdminPermission(permissions.BasePermission):
         return (request.method in permissions.SAFE_METHODS
                 or request.user.is_superuser
                 or obj.author == request.user)
+
+
+class MetricsPermission(permissions.BasePermission):
+    """Метрики доступны администраторам и сборщику с токеном
+    METRICS_TOKEN в заголовке Authorization: Bearer."""
+
+    def has_permission(self, request, view):
+        if request.user.is_staff:
+            return True
+        keyword, _, token = request.headers.get(
+            'Authorization', ''
+        ).partition(' ')
+        return bool(settings.METRICS_TOKEN) and keyword == 'Bearer' and (
+            constant_time_compare(token, settings.METRICS_TOKEN)
+        )
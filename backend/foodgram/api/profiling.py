@@ -0,0 +1,82 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import slugify
+
+
+class StackSampler(threading.Thread):
+    """Периодически снимает стек потока запроса.
+
+    Стеки копятся в формате collapsed stacks (корень слева, кадры через
+    точку с запятой), из которого строится flamegraph.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} ({os.path.basename(code.co_filename)}'
+                    f':{code.co_firstlineno})'
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class RequestProfiler:
+    """cProfile и сэмплер стеков для одного запроса."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.duration = None
+
+    def __enter__(self):
+        # Профилируется поток, в котором выполняется представление.
+        self.sampler = StackSampler(threading.get_ident(),
+                                    settings.PROFILING_SAMPLE_INTERVAL)
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.profile.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+
+    def save(self, request, view):
+        """Сохраняет pstats и collapsed stacks, возвращает имя профиля."""
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        name = '{:%Y%m%d-%H%M%S-%f}-{}-{}-{:.0f}ms'.format(
+            timezone.now(), request.method.lower(),
+            slugify(view), self.duration * 1000
+        )
+        path = os.path.join(settings.PROFILING_DIR, name)
+        self.profile.dump_stats(f'{path}.prof')
+        self.sampler.write(f'{path}.collapsed')
+        return name
@@ -0,0 +1,170 @@
+import csv
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from rest_framework import renderers
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 11
+PDF_LEADING = 14
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+PDF_ENCODING = 'cp1251'
+# Глифы кириллицы для байтов cp1251 поверх WinAnsiEncoding.
+PDF_CYRILLIC_DIFFERENCES = (
+    b'168 /afii10023 184 /afii10071 185 /afii61352 192 '
+    + b' '.join(
+        b'/afii%d' % code
+        for code in (*range(10017, 10023), *range(10024, 10050),
+                     *range(10065, 10071), *range(10072, 10098))
+    )
+)
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    """Текстовый формат метрик Prometheus."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(f'# {key}: {value}'
+                             for key, value in data.items())
+        return str(data).encode(self.charset)
+
+
+class ShoppingListRenderer(ABC, renderers.BaseRenderer):
+    """Базовый рендерер списка покупок с потоковой выдачей."""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+    @staticmethod
+    def get_header(user):
+        return (
+            f'Список покупок для: {user.get_full_name()}',
+            f'Дата: {datetime.today():%Y-%m-%d}',
+        )
+
+    @abstractmethod
+    def stream(self, user, items):
+        """Части файла списка покупок для StreamingHttpResponse."""
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, user, items):
+        for line in self.get_header(user):
+            yield f'{line}\n\n'
+        for item in items:
+            yield f'{item["name"]}, {item["amount"]} {item["unit"]}\n'
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку для csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, user, items):
+        writer = csv.writer(Echo())
+        yield '\ufeff' + writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        )
+        for item in items:
+            yield writer.writerow((item['name'], item['amount'], item['unit']))
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    """Постраничная генерация PDF без сборки документа в памяти."""
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+    @staticmethod
+    def escape(line):
+        line = line.encode(PDF_ENCODING, errors='replace')
+        return (line.replace(b'\\', b'\\\\')
+                .replace(b'(', b'\\(')
+                .replace(b')', b'\\)'))
+
+    def get_lines(self, user, items):
+        yield from self.get_header(user)
+        yield ''
+        for item in items:
+            yield f'{item["name"]}, {item["amount"]} {item["unit"]}'
+
+    def get_pages(self, lines):
+        page = []
+        for line in lines:
+            page.append(line)
+            if len(page) == PDF_LINES_PER_PAGE:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def get_content(self, page):
+        content = [
+            b'BT /F1 %d Tf %d TL %d %d Td' % (
+                PDF_FONT_SIZE, PDF_LEADING,
+                PDF_MARGIN, PDF_PAGE_HEIGHT - PDF_MARGIN
+            )
+        ]
+        content.extend(b'(%s) Tj T*' % self.escape(line) for line in page)
+        content.append(b'ET')
+        return b'\n'.join(content)
+
+    def stream(self, user, items):
+        offsets = {}
+        position = 0
+
+        def write_object(number, body):
+            nonlocal position
+            offsets[number] = position
+            chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+            position += len(chunk)
+            return chunk
+
+        header = b'%PDF-1.4\n'
+        position += len(header)
+        yield header
+        yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        yield write_object(3, (
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+            b'/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+            b'/Differences [%s] >> >>' % PDF_CYRILLIC_DIFFERENCES
+        ))
+        kids = []
+        number = 3
+        for page in self.get_pages(self.get_lines(user, items)):
+            content = self.get_content(page)
+            yield write_object(number + 1, b'<< /Length %d >>\nstream\n%s\n'
+                               b'endstream' % (len(content), content))
+            yield write_object(number + 2, (
+                b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>'
+                % (PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT, number + 1)
+            ))
+            kids.append(b'%d 0 R' % (number + 2))
+            number += 2
+        yield write_object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(kids), len(kids)
+        ))
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % (number + 1)]
+        xref.extend(b'%010d 00000 n \n' % offsets[obj]
+                    for obj in range(1, number + 1))
+        yield b''.join(xref)
+        yield (b'trailer\n<< /Size %d /Root 1 0 R >>\n'
+               b'startxref\n%d\n%%%%EOF\n' % (number + 1, position))
@@ -0,0 +1,159 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from api.cache import bump_generation, get_generation
+from api.db_router import use_primary
+from recipes.models import Ingredient
+
+INGREDIENT_INDEX_VERSION_KEY = 'ingredient_index_version'
+
+
+def normalize(value):
+    return ' '.join(value.casefold().replace('ё', 'е').split())
+
+
+def get_typo_limit(query):
+    """Допустимое число опечаток в зависимости от длины запроса."""
+    if len(query) < 4:
+        return 0
+    if len(query) < 8:
+        return 1
+    return 2
+
+
+def get_prefix_distance(query, word, limit):
+    """Наименьшее расстояние Левенштейна от запроса до префикса слова.
+
+    Расчет прерывается, как только расстояние превышает limit.
+    """
+    previous = list(range(len(word) + 1))
+    for row, query_char in enumerate(query, 1):
+        current = [row]
+        for column, word_char in enumerate(word, 1):
+            current.append(min(
+                previous[column] + 1,
+                current[column - 1] + 1,
+                previous[column - 1] + (query_char != word_char),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous)
+
+
+class IngredientSnapshot:
+    """Неизменяемый срез индекса ингредиентов одной версии.
+
+    Срез строится целиком и публикуется одним присваиванием, поэтому
+    поиск, взявший ссылку на срез, не видит частично перестроенный индекс.
+    """
+
+    def __init__(self, version, entries):
+        keyed = sorted(
+            ((normalize(entry['name']), entry) for entry in entries),
+            key=lambda item: (item[0], item[1]['id'])
+        )
+        words = {}
+        for name, entry in keyed:
+            for position, word in enumerate(name.split()):
+                words.setdefault(word, []).append((position, name, entry))
+        self.version = version
+        self.entries = tuple(entries)
+        self.names = tuple(name for name, _ in keyed)
+        self.sorted_entries = tuple(entry for _, entry in keyed)
+        self.words = words
+        self.text = '\n'.join(self.names)
+        offsets = []
+        offset = 0
+        for name in self.names:
+            offsets.append(offset)
+            offset += len(name) + 1
+        self.offsets = tuple(offsets)
+
+    def search(self, query):
+        query = normalize(query)
+        if not query:
+            return list(self.entries)
+        names = self.names
+        start = bisect_left(names, query)
+        end = start
+        while end < len(names) and names[end].startswith(query):
+            end += 1
+        result = list(self.sorted_entries[start:end])
+        result.extend(self.substring_search(query))
+        if result:
+            return result
+        return self.fuzzy_search(query)
+
+    def substring_search(self, query):
+        """Совпадения по подстроке не с начала названия."""
+        position = self.text.find(query)
+        while position != -1:
+            index = bisect_right(self.offsets, position) - 1
+            if position != self.offsets[index]:
+                yield self.sorted_entries[index]
+            if index + 1 == len(self.offsets):
+                break
+            position = self.text.find(query, self.offsets[index + 1])
+
+    def fuzzy_search(self, query):
+        limit = get_typo_limit(query)
+        if not limit:
+            return []
+        query_chars = set(query)
+        matches = {}
+        for word, occurrences in self.words.items():
+            prefix = word[:len(query) + limit]
+            if len(query_chars.difference(prefix)) > limit:
+                continue
+            distance = get_prefix_distance(query, prefix, limit)
+            if distance > limit:
+                continue
+            for position, name, entry in occurrences:
+                key = (distance, position > 0, name)
+                if entry['id'] not in matches or matches[entry['id']][0] > key:
+                    matches[entry['id']] = key, entry
+        return [entry for _, entry in sorted(matches.values(),
+                                             key=lambda match: match[0])]
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Сначала выдаются совпадения по началу названия, затем по подстроке,
+    а при их отсутствии - названия с небольшим числом опечаток.
+    Индекс перестраивается при изменении версии в кеше.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def invalidate(self):
+        bump_generation(INGREDIENT_INDEX_VERSION_KEY)
+        self.snapshot = None
+
+    def refresh(self):
+        """Срез текущей версии, при необходимости перестроенный."""
+        version = get_generation(INGREDIENT_INDEX_VERSION_KEY)
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        # Индекс помечается версией из кеша, поэтому читается с основной
+        # БД, а не с реплики, которая может еще не содержать изменений.
+        with self.lock, use_primary():
+            snapshot = self.snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = IngredientSnapshot(
+                    version, Ingredient.objects.values(
+                        'id', 'name', 'measurement_unit'
+                    )
+                )
+                self.snapshot = snapshot
+        return snapshot
+
+    def search(self, query):
+        return self.refresh().search(query)
+
+
+ingredient_index = IngredientIndex()
@@ -1,18 +1,65 @@
 import base64
-
+import binascii
+import json
+import time
+
+from api.cache import invalidate_recipes_cache
+from api.feed import fan_out_recipes
+from api.metrics import current_recorder
+from api.pantry import mark_recipes_changed
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from django.http import QueryDict
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from recipes.images import (IMAGE_FORMATS, IMAGE_VARIANTS,
+                            schedule_image_variants)
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
-                            ShoppingCart, Tag)
+                            RecipeTags, ShoppingCart, Tag)
+from recipes.search import schedule_search_documents
 from rest_framework import serializers, status
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueTogetherValidator
 
 User = get_user_model()
 
+BASE64_CHUNK_SIZE = 64 * 1024
+BASE64_WHITESPACE = dict.fromkeys(map(ord, ' \t\r\n'))
+IMAGE_DATA_URI_HEADER_LIMIT = 100
+IMAGE_SIGNATURES = {
+    'image/jpeg': ('jpg', b'\xff\xd8\xff'),
+    'image/jpg': ('jpg', b'\xff\xd8\xff'),
+    'image/png': ('png', b'\x89PNG\r\n\x1a\n'),
+    'image/gif': ('gif', b'GIF8'),
+    'image/webp': ('webp', b'RIFF'),
+}
+
+
+class SerializationTimingMixin:
+    """Учитывает время сериализации в метриках текущего запроса.
 
-class CustomUserSerializer(UserSerializer):
+    Время считает только внешний сериализатор ответа: вложенные
+    сериализаторы и элементы many=True входят в его время.
+    """
+
+    def to_representation(self, instance):
+        recorder = current_recorder.get()
+        if recorder is None or recorder.serializing:
+            return super().to_representation(instance)
+        recorder.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            recorder.serializing = False
+            recorder.serialize_duration += time.perf_counter() - started
+
+
+class CustomUserSerializer(SerializationTimingMixin, UserSerializer):
     """Сериализатор пользователя"""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -22,6 +69,8 @@ class CustomUserSerializer(UserSerializer):
                   'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if self.context.get('request').user.is_anonymous:
             return False
@@ -65,19 +114,25 @@ class SubscriptionSerializer(CustomUserSerializer):
         return data
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        if hasattr(obj, 'recipe_previews'):
+            recipes = obj.recipe_previews
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = obj.recipes.all()
+            if limit:
+                recipes = recipes[:int(limit)]
         serializer = ShortRecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SerializationTimingMixin,
+                           serializers.ModelSerializer):
     """Сериализатор ингридиентов"""
 
     class Meta:
@@ -92,7 +147,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         ]
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SerializationTimingMixin, serializers.ModelSerializer):
     """Сериализатор тегов"""
 
     class Meta:
@@ -100,16 +155,158 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
+def decode_base64_chunks(data, start):
+    """Декодирует base64 из строки data начиная с start частями.
+
+    Переводы строк и пробелы пропускаются: клиенты часто переносят
+    base64 по строкам, как в MIME. Остаток, не кратный четырем
+    символам, переносится в следующую часть.
+    """
+    rest = ''
+    for position in range(start, len(data), BASE64_CHUNK_SIZE):
+        chunk = rest + data[position:position + BASE64_CHUNK_SIZE].translate(
+            BASE64_WHITESPACE
+        )
+        end = len(chunk) - len(chunk) % 4
+        rest = chunk[end:]
+        if end:
+            yield base64.b64decode(chunk[:end], validate=True)
+    if rest:
+        raise binascii.Error('Incorrect padding')
+
+
 class Base64ImageField(serializers.ImageField):
-    """Сериализатор фото"""
+    """Сериализатор фото.
+
+    Принимает файл из multipart-запроса или data URI в base64. Base64
+    декодируется частями во временный файл с проверкой размера и сигнатуры
+    изображения по первому фрагменту.
+    """
+    default_error_messages = {
+        'too_large': 'Размер изображения больше {max_size} байт.',
+        'invalid_base64': 'Некорректные данные изображения в base64.',
+        'invalid_type': 'Неподдерживаемый тип изображения.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode_base64(data)
+            # Файл закрывает корневой сериализатор с TemporaryFilesMixin.
+            temporary_files = getattr(self.root, 'temporary_files', None)
+            if temporary_files is not None:
+                temporary_files.append(data)
+        elif getattr(data, 'size', 0) > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
 
         return super().to_internal_value(data)
 
+    def decode_base64(self, data):
+        header_end = data.find(';base64,', 0, IMAGE_DATA_URI_HEADER_LIMIT)
+        if header_end == -1:
+            self.fail('invalid_base64')
+        content_type = data[len('data:'):header_end]
+        ext = IMAGE_SIGNATURES.get(content_type)
+        if ext is None:
+            self.fail('invalid_type')
+        start = header_end + len(';base64,')
+        file = TemporaryUploadedFile(
+            'temp.' + ext[0], content_type, (len(data) - start) * 3 // 4,
+            None
+        )
+        try:
+            for chunk in decode_base64_chunks(data, start):
+                if not file.tell() and not chunk.startswith(ext[1]):
+                    self.fail('invalid_type')
+                file.write(chunk)
+                if file.tell() > settings.RECIPE_IMAGE_MAX_SIZE:
+                    self.fail('too_large',
+                              max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
+
+class TemporaryFilesMixin:
+    """Закрывает временные файлы изображений из base64 после сохранения
+    или неудачной проверки.
+
+    Иначе файл остается на диске до сборки мусора, а файл, который
+    хранилище уже переместило, при удалении выдает FileNotFoundError.
+    """
+
+    @cached_property
+    def temporary_files(self):
+        return []
+
+    def close_temporary_files(self):
+        while self.temporary_files:
+            self.temporary_files.pop().close()
+
+    def is_valid(self, raise_exception=False):
+        try:
+            valid = super().is_valid(raise_exception=raise_exception)
+        except serializers.ValidationError:
+            self.close_temporary_files()
+            raise
+        if not valid:
+            self.close_temporary_files()
+        return valid
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            self.close_temporary_files()
+
+
+class ImageVariantsMixin(serializers.Serializer):
+    """Адреса уменьшенных копий изображения рецепта.
+
+    Пока копии не созданы, поля пустые и клиент использует image.
+    """
+    image_variants = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+
+    def get_image_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def get_image_variants(self, obj):
+        variants = {}
+        for variant in IMAGE_VARIANTS:
+            names = obj.image_variants.get(variant)
+            if names:
+                variants[variant] = {
+                    extension: self.get_image_url(names[extension])
+                    for extension in IMAGE_FORMATS
+                }
+        return variants
+
+    def get_image_srcset(self, obj):
+        variants = [
+            obj.image_variants[variant] for variant in IMAGE_VARIANTS
+            if variant in obj.image_variants
+        ]
+        if not variants:
+            return {}
+        return {
+            extension: ', '.join(
+                f'{self.get_image_url(variant[extension])} '
+                f'{variant["width"]}w'
+                for variant in variants
+            )
+            for extension in IMAGE_FORMATS
+        }
+
 
 class RecipeIngredientsSerializer(serializers.ModelSerializer):
     """Сериализатор связи ингридиентов и рецепта"""
@@ -134,7 +331,14 @@ class RecipeIngredientsSerializer(serializers.ModelSerializer):
         }
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class IngredientAmountSerializer(serializers.Serializer):
+    """Сериализатор ингредиента с количеством при записи рецепта"""
+    id = serializers.IntegerField()
+    amount = serializers.IntegerField()
+
+
+class RecipeReadSerializer(SerializationTimingMixin, ImageVariantsMixin,
+                           serializers.ModelSerializer):
     """Сериализатор просмотра рецепта"""
     author = CustomUserSerializer(read_only=True,
                                   default=serializers.CurrentUserDefault())
@@ -149,38 +353,42 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
                   'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'cooking_time', 'favorites_count', 'shopping_cart_count',
+                  'image_variants', 'image_srcset')
 
-    def get_is_favorited(self, obj):
-        user_name = self.context['request'].user
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_author_subscribed'):
+            instance.author.is_subscribed = instance.is_author_subscribed
+        return super().to_representation(instance)
 
-        if self.context['request'].user.is_authenticated:
-            user = get_object_or_404(
-                User, username=user_name)
-            return user.favorites.filter(recipe=obj.id).exists()
-        return False
+    def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        user = self.context['request'].user
+        return (user.is_authenticated
+                and user.favorites.filter(recipe=obj.id).exists())
 
     def get_is_in_shopping_cart(self, obj):
-        user_name = self.context['request'].user
-
-        if self.context['request'].user.is_authenticated:
-            user = get_object_or_404(
-                User, username=user_name)
-            return user.shopping_list.filter(recipe=obj.id).exists()
-        return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        user = self.context['request'].user
+        return (user.is_authenticated
+                and user.shopping_list.filter(recipe=obj.id).exists())
 
 
-class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
+class RecipeCreateUpdateSerializer(SerializationTimingMixin,
+                                   TemporaryFilesMixin,
+                                   serializers.ModelSerializer):
     """Сериализатор создания и обновления рецепта"""
-    ingredients = RecipeIngredientsSerializer(
+    ingredients = IngredientAmountSerializer(
         many=True,
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
+    tags = serializers.ListField(
+        child=serializers.IntegerField()
     )
     image = Base64ImageField()
-    author = UserSerializer(read_only=True)
+    author = UserSerializer(read_only=True,
+                            default=serializers.CurrentUserDefault())
     cooking_time = serializers.IntegerField()
 
     class Meta:
@@ -197,12 +405,40 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             )
         ]
 
-    def validate_tags(self, tags):
-        for tag in tags:
-            if not Tag.objects.filter(id=tag.id).exists():
+    def to_internal_value(self, data):
+        """Принимает multipart-запрос с ингредиентами в виде JSON-строки."""
+        if isinstance(data, QueryDict):
+            data = self.parse_multipart(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def parse_multipart(data):
+        parsed = data.dict()
+        parsed['tags'] = data.getlist('tags')
+        ingredients = data.get('ingredients')
+        if isinstance(ingredients, str):
+            try:
+                parsed['ingredients'] = json.loads(ingredients)
+            except ValueError:
                 raise serializers.ValidationError(
-                    'Указанного тега не существует')
-        return tags
+                    {'ingredients': 'Некорректный JSON ингредиентов.'}
+                )
+        return parsed
+
+    @staticmethod
+    def check_tags(tags):
+        if not tags:
+            raise serializers.ValidationError(
+                'Отсутствуют теги')
+        return list(dict.fromkeys(tags))
+
+    def validate_tags(self, tags):
+        tags = self.check_tags(tags)
+        found = Tag.objects.in_bulk(tags)
+        if len(found) != len(tags):
+            raise serializers.ValidationError(
+                'Указанного тега не существует')
+        return [found[tag_id] for tag_id in tags]
 
     def validate_cooking_time(self, cooking_time):
         if cooking_time < 1:
@@ -210,7 +446,8 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
                 'Минимальное время приготовления 1 минута')
         return cooking_time
 
-    def validate_ingredients(self, ingredients):
+    @staticmethod
+    def check_ingredients(ingredients):
         ingredients_list = []
         if not ingredients:
             raise serializers.ValidationError(
@@ -225,52 +462,293 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             ingredients_list.append(ingredient['id'])
         return ingredients
 
+    def validate_ingredients(self, ingredients):
+        ingredients_list = [
+            ingredient['id'] for ingredient in
+            self.check_ingredients(ingredients)
+        ]
+        found = Ingredient.objects.in_bulk(ingredients_list)
+        if len(found) != len(ingredients_list):
+            raise serializers.ValidationError(
+                'Указанного ингредиента не существует')
+        return [
+            {'ingredient': found[ingredient['id']],
+             'amount': ingredient['amount']}
+            for ingredient in ingredients
+        ]
+
     @staticmethod
     def save_ingredients(recipe, ingredients):
         """Метод создания ингредиента."""
-        ingredients_list = []
-        for ingredient in ingredients:
-            ingredients_list.append(
-                RecipeIngredients(
-                    amount=ingredient['amount'],
-                    ingredient=get_object_or_404(
-                        Ingredient, pk=ingredient['id']), recipe=recipe,
-                )
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(
+                recipe=recipe,
+                ingredient=ingredient['ingredient'],
+                amount=ingredient['amount'],
             )
-        RecipeIngredients.objects.bulk_create(ingredients_list)
+            for ingredient in ingredients
+        )
 
+    @classmethod
+    def update_ingredients(cls, recipe, ingredients):
+        """Применяет к ингредиентам рецепта только изменения."""
+        existing = {
+            item.ingredient_id: item
+            for item in RecipeIngredients.objects.filter(recipe=recipe)
+        }
+        submitted = {
+            ingredient['ingredient'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = [
+            item.id for ingredient_id, item in existing.items()
+            if ingredient_id not in submitted
+        ]
+        changed = []
+        for ingredient_id, amount in submitted.items():
+            item = existing.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        added = [
+            ingredient for ingredient in ingredients
+            if ingredient['ingredient'].id not in existing
+        ]
+        if removed:
+            RecipeIngredients.objects.filter(id__in=removed).delete()
+        if changed:
+            RecipeIngredients.objects.bulk_update(changed, ('amount',))
+        if added:
+            cls.save_ingredients(recipe, added)
+
+    @transaction.atomic
     def create(self, validated_data):
         """Метод создания рецепта."""
-        request = self.context.get('request', None)
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(**validated_data, author=request.user)
+        recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.save_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Метод обновления рецепта."""
-        instance.tags.clear()
-        RecipeIngredients.objects.filter(recipe=instance).delete()
-        instance.tags.set(validated_data.pop('tags'))
-        ingredients = validated_data.pop('ingredients')
-        self.save_ingredients(instance, ingredients)
+        """Метод обновления рецепта по разнице с сохраненными данными."""
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        ingredients = validated_data.pop('ingredients', None)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).get(pk=instance.pk)
         return RecipeReadSerializer(instance, context={
-            'request': self.context.get('request')
+            'request': request
         }).data
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class ShortRecipeSerializer(SerializationTimingMixin, ImageVariantsMixin,
+                            serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'cooking_time', 'image_variants',
+                  'image_srcset')
+
+
+class PantrySerializer(serializers.Serializer):
+    """Ингредиенты, которые есть у пользователя."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=200
+    )
+
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = {'ingredients': [
+                value for item in data.getlist('ingredients')
+                for value in item.split(',') if value
+            ]}
+        return super().to_internal_value(data)
+
+
+class PantryRecipeSerializer(ShortRecipeSerializer):
+    """Рецепт с долей имеющихся ингредиентов и недостающими."""
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = IngredientSerializer(many=True, read_only=True)
+
+    class Meta(ShortRecipeSerializer.Meta):
+        fields = ShortRecipeSerializer.Meta.fields + (
+            'coverage', 'missing_ingredients'
+        )
+
+
+class RecipeBatchItemSerializer(RecipeCreateUpdateSerializer):
+    """Проверка рецепта из пакета без обращений к БД.
+
+    Существование тегов и ингредиентов и уникальность названия
+    проверяются сразу для всего пакета в RecipeBatchSerializer.
+    """
+
+    class Meta(RecipeCreateUpdateSerializer.Meta):
+        validators = []
+
+    def validate_tags(self, tags):
+        return self.check_tags(tags)
+
+    def validate_ingredients(self, ingredients):
+        return self.check_ingredients(ingredients)
+
+
+class RecipeBatchSerializer(SerializationTimingMixin, TemporaryFilesMixin,
+                            serializers.Serializer):
+    """Сериализатор пакетного создания рецептов.
+
+    В режиме atomic любая ошибка отклоняет весь пакет, иначе создаются
+    только прошедшие проверку рецепты, а ошибки возвращаются по индексам.
+    """
+    recipes = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_MAX_SIZE
+    )
+    atomic = serializers.BooleanField(default=True)
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            data = {'recipes': data}
+        return super().to_internal_value(data)
+
+    def validate(self, data):
+        items, errors = self.validate_recipes_batch(data['recipes'])
+        if errors and (data['atomic'] or not items):
+            raise serializers.ValidationError({
+                'errors': self.format_errors(errors)
+            })
+        data['items'] = items
+        data['errors'] = errors
+        return data
+
+    def validate_recipes_batch(self, recipes):
+        """Проверяет пакет, возвращает данные и ошибки по индексам."""
+        items = {}
+        errors = {}
+        for index, recipe in enumerate(recipes):
+            serializer = RecipeBatchItemSerializer(
+                data=recipe, context=self.context
+            )
+            if serializer.is_valid():
+                items[index] = serializer.validated_data
+                # Файлы закрываются после сохранения всего пакета.
+                self.temporary_files.extend(serializer.temporary_files)
+            else:
+                errors[index] = serializer.errors
+        tags = Tag.objects.in_bulk({
+            tag_id for item in items.values() for tag_id in item['tags']
+        })
+        ingredients = Ingredient.objects.in_bulk({
+            ingredient['id'] for item in items.values()
+            for ingredient in item['ingredients']
+        })
+        names = set(Recipe.objects.filter(
+            author=self.context['request'].user,
+            name__in={item['name'] for item in items.values()}
+        ).values_list('name', flat=True))
+        for index, item in list(items.items()):
+            item_errors = {}
+            if not tags.keys() >= set(item['tags']):
+                item_errors['tags'] = ['Указанного тега не существует']
+            if not ingredients.keys() >= {
+                ingredient['id'] for ingredient in item['ingredients']
+            }:
+                item_errors['ingredients'] = [
+                    'Указанного ингредиента не существует'
+                ]
+            if not item_errors and item['name'] in names:
+                item_errors[api_settings.NON_FIELD_ERRORS_KEY] = [
+                    'Вы уже создавали рецепт с таким названием.'
+                ]
+            if item_errors:
+                errors[index] = item_errors
+                del items[index]
+                continue
+            names.add(item['name'])
+            item['tags'] = [tags[tag_id] for tag_id in item['tags']]
+            item['ingredients'] = [
+                {'ingredient': ingredients[ingredient['id']],
+                 'amount': ingredient['amount']}
+                for ingredient in item['ingredients']
+            ]
+        return items, errors
+
+    @staticmethod
+    def format_errors(errors):
+        """Ошибки по строковым индексам рецептов, как ключи в JSON."""
+        return {
+            str(index): item_errors
+            for index, item_errors in sorted(errors.items())
+        }
+
+    @transaction.atomic
+    def create(self, validated_data):
+        author = self.context['request'].user
+        items = list(validated_data['items'].values())
+        recipes = []
+        for item in items:
+            fields = {
+                field: value for field, value in item.items()
+                if field not in ('tags', 'ingredients', 'author')
+            }
+            recipes.append(Recipe(author=author, **fields))
+        Recipe.objects.bulk_create(recipes)
+        if any(recipe.pk is None for recipe in recipes):
+            ids = dict(Recipe.objects.filter(
+                author=author, name__in=[recipe.name for recipe in recipes]
+            ).values_list('name', 'id'))
+            for recipe in recipes:
+                recipe.pk = ids[recipe.name]
+        RecipeTags.objects.bulk_create(
+            RecipeTags(recipe=recipe, tag=tag)
+            for recipe, item in zip(recipes, items)
+            for tag in item['tags']
+        )
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(
+                recipe=recipe,
+                ingredient=ingredient['ingredient'],
+                amount=ingredient['amount']
+            )
+            for recipe, item in zip(recipes, items)
+            for ingredient in item['ingredients']
+        )
+        # bulk_create не отправляет post_save, поэтому действия
+        # обработчиков сигналов рецепта выполняются здесь.
+        transaction.on_commit(invalidate_recipes_cache)
+        transaction.on_commit(lambda: mark_recipes_changed(
+            recipe.pk for recipe in recipes
+        ))
+        schedule_search_documents(recipe.pk for recipe in recipes)
+        transaction.on_commit(lambda: fan_out_recipes(recipes))
+        for recipe in recipes:
+            schedule_image_variants(recipe)
+        return {'created': recipes, 'errors': validated_data['errors']}
+
+    def to_representation(self, instance):
+        return {
+            'created': ShortRecipeSerializer(
+                instance['created'], many=True, context=self.context
+            ).data,
+            'errors': self.format_errors(instance['errors']),
+        }
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class ShoppingCartSerializer(SerializationTimingMixin,
+                             serializers.ModelSerializer):
     """Сериализатор для списка покупок"""
 
     class Meta:
@@ -292,7 +770,8 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         ).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(SerializationTimingMixin,
+                         serializers.ModelSerializer):
     """Сериализатор избранных рецептов"""
 
     class Meta:
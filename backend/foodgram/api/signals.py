@@ -0,0 +1,88 @@
+from api.cache import invalidate_recipes_cache, invalidate_tags_cache
+from api.feed import fan_out_recipes
+from api.metrics import record_query
+from api.pantry import mark_recipes_changed
+from api.search import ingredient_index
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes.images import schedule_image_variants
+from recipes.models import (Ingredient, Recipe, RecipeIngredients, RecipeTags,
+                            Tag)
+from recipes.search import delete_search_documents, schedule_search_documents
+
+
+@receiver(connection_created)
+def install_query_recorder(connection, **kwargs):
+    # Обертка добавляется в начало списка, чтобы не мешать временным
+    # оберткам connection.execute_wrapper(), которые снимаются с конца.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    transaction.on_commit(invalidate_tags_cache)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredients)
+@receiver((post_save, post_delete), sender=RecipeTags)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_recipes_response_cache(**kwargs):
+    transaction.on_commit(invalidate_recipes_cache)
+
+
+@receiver(post_save, sender=Recipe)
+def build_recipe_image_variants(instance, **kwargs):
+    schedule_image_variants(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_document(instance, **kwargs):
+    schedule_search_documents((instance.pk,))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_search_document(instance, **kwargs):
+    delete_search_documents((instance.pk,))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredients)
+def update_ingredient_search_document(instance, **kwargs):
+    schedule_search_documents((instance.recipe_id,))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search_documents(instance, created, **kwargs):
+    if not created:
+        schedule_search_documents(RecipeIngredients.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True).distinct())
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_recipe_pantry_index(instance, **kwargs):
+    transaction.on_commit(lambda: mark_recipes_changed((instance.pk,)))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredients)
+def update_ingredient_pantry_index(instance, **kwargs):
+    transaction.on_commit(
+        lambda: mark_recipes_changed((instance.recipe_id,))
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: fan_out_recipes((instance,)))
@@ -1,5 +1,5 @@
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet)
+from api.views import (CustomUserViewSet, IngredientViewSet, MetricsView,
+                       RecipeViewSet, TagViewSet)
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -10,5 +10,6 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('users', CustomUserViewSet, basename='users')
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
 ]
@@ -1,39 +1,117 @@
-from datetime import datetime
+from collections import defaultdict
 
+from api.async_views import AsyncViewSetMixin
+from api.cache import (RECIPES_GENERATION_KEY, TAGS_GENERATION_KEY,
+                       AnonymousResponseCacheMixin, ConditionalGetMixin,
+                       get_generation, get_recipes_cache_stats)
+from api.counters import (COUNTER_FIELDS, add_recipe_counters,
+                          cache_recipe_counters, get_cached_recipe_counters,
+                          get_recipe_counters)
+from api.db_router import ReplicaReadMixin
+from api.feed import (FEED_ORDERING, get_feed_rows, subscribe_feed,
+                      unsubscribe_feed)
 from api.filters import RecipeFilter
-from api.pagination import CustomPageNumberPagination
-from api.permissions import IsAuthorOrAdminPermission
+from api.metrics import metrics_registry
+from api.pagination import (CustomPageNumberPagination, FeedPagination,
+                            KeysetPagination, SubscriptionPagination)
+from api.pantry import pantry_index
+from api.permissions import IsAuthorOrAdminPermission, MetricsPermission
+from api.renderers import (PrometheusRenderer, ShoppingListCSVRenderer,
+                           ShoppingListPDFRenderer, ShoppingListTextRenderer)
+from api.search import INGREDIENT_INDEX_VERSION_KEY, ingredient_index
 from api.serializers import (FavoriteSerializer, IngredientSerializer,
+                             PantryRecipeSerializer, PantrySerializer,
+                             RecipeBatchSerializer,
                              RecipeCreateUpdateSerializer,
                              RecipeReadSerializer, ShoppingCartSerializer,
-                             SubscriptionSerializer, TagSerializer)
+                             ShortRecipeSerializer, SubscriptionSerializer,
+                             TagSerializer)
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import (BooleanField, Count, F, IntegerField, OuterRef,
+                              Subquery, Sum, Value)
+from django.db.models.functions import Coalesce, Greatest
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
                             ShoppingCart, Tag)
-from rest_framework import exceptions, filters, status, viewsets
+from rest_framework import exceptions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 from users.models import Subscription
 
 User = get_user_model()
 
+SIMILAR_LIMIT = 10
+SIMILAR_MAX_LIMIT = 20
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(AsyncViewSetMixin, ReplicaReadMixin, ConditionalGetMixin,
+                    AnonymousResponseCacheMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrAdminPermission,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = CustomPageNumberPagination
+    pagination_class = FeedPagination
+    cache_control = {'no_cache': True}
+    vary_headers = ('Authorization',)
+    generation_keys = (RECIPES_GENERATION_KEY,)
+
+    def get_conditional_version(self, request):
+        """Версия рецепта из одного легкого запроса без связанных данных.
+
+        В версию входят флаги пользователя, профиль автора и поколения
+        тегов и ингредиентов. Анонимный ответ берется из кеша по поколению
+        рецептов, поэтому и ETag строится из того же поколения и счетчиков
+        рецепта из кеша, а не из текущих данных в БД.
+        """
+        if self.action != 'retrieve':
+            return None
+        if request.user.is_anonymous:
+            # Пока счетчиков нет в кеше, ответ сформируется без ETag и
+            # сохранит их. Время их изменения в кеше не хранится, поэтому
+            # ответ проверяется только по ETag.
+            counters = get_cached_recipe_counters(self.kwargs['pk'])
+            if counters is None:
+                return None
+            return (get_generation(RECIPES_GENERATION_KEY), counters), None
+        fields = ['updated_at', 'favorites_count', 'shopping_cart_count',
+                  'is_favorited', 'is_in_shopping_cart',
+                  'is_author_subscribed', 'author__username',
+                  'author__first_name', 'author__last_name',
+                  'author__email']
+        try:
+            version = Recipe.objects.with_user_flags(request.user).filter(
+                pk=self.kwargs['pk']
+            ).values_list(*fields).first()
+        except (ValueError, ValidationError):
+            # Некорректный id: ответ 404 сформирует само представление.
+            return None
+        if version is None:
+            return None
+        # Флаги пользователя и профиль автора не хранят время изменения,
+        # поэтому ответ проверяется только по ETag.
+        return version + tuple(
+            get_generation(key)
+            for key in (TAGS_GENERATION_KEY, INGREDIENT_INDEX_VERSION_KEY)
+        ), None
+
+    def get_queryset(self):
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        )
 
     def get_serializer_class(self):
-        if self.action in ('create', 'partial_update'):
+        if self.action in ('create', 'update', 'partial_update'):
             return RecipeCreateUpdateSerializer
 
         return RecipeReadSerializer
@@ -41,6 +119,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @staticmethod
+    def get_cached_items(data):
+        if isinstance(data, list):
+            return data
+        return data['results'] if 'results' in data else [data]
+
+    def cache_data(self, key, data):
+        super().cache_data(key, data)
+        add_recipe_counters(self.get_cached_items(data))
+
+    def update_cached_data(self, data):
+        """Подставляет в ответ из кеша текущие счетчики рецептов."""
+        items = self.get_cached_items(data)
+        counters = get_recipe_counters([item['id'] for item in items])
+        for item in items:
+            if item['id'] in counters:
+                item.update({
+                    field: counters[item['id']][field]
+                    for field in COUNTER_FIELDS
+                })
+        return data
+
+    @staticmethod
+    def update_counter(recipe, field, delta):
+        """Атомарно изменяет счетчик рецепта на стороне БД.
+
+        Счетчики не меняют поколение рецептов: иначе каждое добавление
+        в избранное сбрасывало бы весь кеш анонимных ответов и ETag.
+        Вместо этого после коммита обновляются счетчики рецепта в кеше.
+        """
+        Recipe.objects.filter(pk=recipe.pk).update(
+            **{field: Greatest(F(field) + delta, 0)},
+            updated_at=timezone.now()
+        )
+        transaction.on_commit(lambda: cache_recipe_counters((recipe.pk,)))
+
     @action(detail=True, methods=('post',))
     def favorite(self, request, pk=None):
         context = {"request": request}
@@ -51,16 +165,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
         }
         serializer = FavoriteSerializer(data=data, context=context)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            self.update_counter(recipe, 'favorites_count', 1)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
     def destroy_favorite(self, request, pk):
-        get_object_or_404(
-            Favorite,
-            user=request.user,
-            recipe=get_object_or_404(Recipe, id=pk)
-        ).delete()
+        recipe = get_object_or_404(Recipe, id=pk)
+        with transaction.atomic():
+            get_object_or_404(
+                Favorite,
+                user=request.user,
+                recipe=recipe
+            ).delete()
+            self.update_counter(recipe, 'favorites_count', -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=('post',))
@@ -73,87 +192,261 @@ class RecipeViewSet(viewsets.ModelViewSet):
         }
         serializer = ShoppingCartSerializer(data=data, context=context)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            self.update_counter(recipe, 'shopping_cart_count', 1)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
     def destroy_shopping_cart(self, request, pk):
-        get_object_or_404(
-            ShoppingCart,
-            user=request.user.id,
-            recipe=get_object_or_404(Recipe, id=pk)
-        ).delete()
+        recipe = get_object_or_404(Recipe, id=pk)
+        with transaction.atomic():
+            get_object_or_404(
+                ShoppingCart,
+                user=request.user.id,
+                recipe=recipe
+            ).delete()
+            self.update_counter(recipe, 'shopping_cart_count', -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=False,
-        methods=('get',),
+        methods=('post',),
         permission_classes=(IsAuthenticated,)
     )
+    def batch(self, request):
+        """Пакетное создание рецептов для импорта."""
+        serializer = RecipeBatchSerializer(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        if serializer.data['errors']:
+            return Response(serializer.data,
+                            status=status.HTTP_207_MULTI_STATUS)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=('get',))
+    def similar(self, request, pk=None):
+        """Похожие рецепты по совместному избранному одним запросом."""
+        try:
+            limit = int(request.query_params.get('limit', SIMILAR_LIMIT))
+        except ValueError:
+            limit = SIMILAR_LIMIT
+        limit = min(max(limit, 1), SIMILAR_MAX_LIMIT)
+        try:
+            recipe_id = int(pk)
+        except ValueError:
+            raise exceptions.NotFound
+        recipes = list(Recipe.objects.filter(
+            similar_to__recipe=recipe_id
+        ).order_by('-similar_to__score').only(
+            'id', 'name', 'image', 'cooking_time', 'image_variants'
+        )[:limit])
+        # Существование рецепта проверяется, только если похожих нет.
+        if not recipes and not Recipe.objects.filter(pk=recipe_id).exists():
+            raise exceptions.NotFound
+        serializer = ShortRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        pagination_class=CustomPageNumberPagination
+    )
+    def pantry(self, request):
+        """Рецепты по доле ингредиентов, которые есть у пользователя."""
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        pantry = frozenset(serializer.validated_data['ingredients'])
+        page = self.paginate_queryset(pantry_index.rank(pantry))
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time', 'image_variants'
+        ).in_bulk([recipe_id for recipe_id, _, _ in page])
+        missing = {
+            recipe_id: pantry_index.get_missing(recipe_id, pantry)
+            for recipe_id, _, _ in page
+        }
+        ingredients = Ingredient.objects.in_bulk(
+            set().union(*missing.values())
+        )
+        results = []
+        for recipe_id, coverage, _ in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = round(coverage, 4)
+            recipe.missing_ingredients = sorted(
+                (ingredients[ingredient_id]
+                 for ingredient_id in missing[recipe_id]
+                 if ingredient_id in ingredients),
+                key=lambda ingredient: ingredient.name
+            )
+            results.append(recipe)
+        serializer = PantryRecipeSerializer(
+            results, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAdminUser,)
+    )
+    def cache_stats(self, request):
+        """Статистика кеша ответов для анонимных пользователей."""
+        return Response(get_recipes_cache_stats())
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(ShoppingListTextRenderer, ShoppingListCSVRenderer,
+                          ShoppingListPDFRenderer)
+    )
     def download_shopping_cart(self, request):
         """Метод для скачивания списка покупок."""
         user = request.user
-        shopping_cart = ShoppingCart.objects.filter(user=user)
-        recipes = [item.recipe.id for item in shopping_cart]
         buy_list = RecipeIngredients.objects.filter(
-            recipe__in=recipes
+            recipe__in_shopping_list__user=user
         ).values(
-            'ingredient'
+            name=F('ingredient__name'),
+            unit=F('ingredient__measurement_unit')
         ).annotate(
             amount=Sum('amount')
+        ).order_by('name')
+        # Под ASGI ответ перебирается в цикле событий без доступа к БД:
+        # строки списка, по одной на ингредиент, читаются здесь же, в
+        # потоке пула, а файл по-прежнему формируется частями.
+        items = list(buy_list) if settings.ASYNC_VIEWS else buy_list.iterator()
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(user, items),
+            content_type=renderer.media_type
         )
-        today = datetime.today()
-        buy_list_text = (
-            f'Список покупок для: {user.get_full_name()}\n\n'
-            f'Дата: {today:%Y-%m-%d}\n\n'
-        )
-        for item in buy_list:
-            ingredient = Ingredient.objects.get(pk=item['ingredient'])
-            amount = item['amount']
-            buy_list_text += (
-                f'{ingredient.name}, {amount} '
-                f'{ingredient.measurement_unit}\n'
-            )
-
-        response = HttpResponse(buy_list_text, content_type="text/plain")
         response['Content-Disposition'] = (
-            'attachment; filename=shopping-list.txt'
+            f'attachment; filename=shopping-list.{renderer.format}'
         )
+        return response
+
+
+class ReferenceDataViewSet(AsyncViewSetMixin, ReplicaReadMixin,
+                           ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """Справочники с версией из кеша и заголовками кеширования."""
+    generation_key = None
+
+    @property
+    def generation_keys(self):
+        return (self.generation_key,)
+
+    @property
+    def cache_control(self):
+        return {'public': True,
+                'max_age': settings.REFERENCE_DATA_MAX_AGE}
 
+    def get_conditional_version(self, request):
+        generation = get_generation(self.generation_key)
+        return generation, generation // 10 ** 9
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(ReferenceDataViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('name',)
+    generation_key = INGREDIENT_INDEX_VERSION_KEY
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(self.search, request)
+
+    def search(self, request):
+        """Поиск по индексу ингредиентов в памяти без обращения к БД."""
+        return Response(ingredient_index.search(
+            request.query_params.get(api_settings.SEARCH_PARAM, '')
+        ))
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReferenceDataViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    generation_key = TAGS_GENERATION_KEY
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ReplicaReadMixin, UserViewSet):
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = CustomPageNumberPagination
 
+    @staticmethod
+    def attach_recipe_previews(authors, limit):
+        """Подгружает рецепты всех авторов страницы одним запросом."""
+        recipes = Recipe.objects.filter(author__in=authors).only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time',
+            'author', 'pub_date'
+        )
+        if limit and limit.isdigit():
+            recipes = recipes.limit_per_author(int(limit))
+        previews = defaultdict(list)
+        for recipe in recipes:
+            previews[recipe.author_id].append(recipe)
+        for author in authors:
+            author.recipe_previews = previews[author.id]
+
     @action(
         detail=False,
         methods=('get',),
         serializer_class=SubscriptionSerializer,
         permission_classes=(IsAuthenticated, ),
-        url_path='me',
+        pagination_class=SubscriptionPagination,
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user)
+        # Полусоединение и подзапрос количества не требуют GROUP BY и
+        # позволяют читать авторов в порядке id без сортировки.
+        queryset = User.objects.filter(id__in=Subscription.objects.filter(
+            user=user
+        ).values('author')).annotate(
+            recipes_count=Coalesce(Subquery(
+                Recipe.objects.filter(author=OuterRef('pk')).order_by()
+                .values('author').annotate(total=Count('id')).values('total'),
+                output_field=IntegerField()
+            ), 0),
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).order_by('id')
         paginated_queryset = self.paginate_queryset(queryset)
+        self.attach_recipe_previews(
+            paginated_queryset, request.query_params.get('recipes_limit')
+        )
         serializer = SubscriptionSerializer(
             paginated_queryset, many=True, context={'request': request}
         )
 
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь."""
+        paginator = KeysetPagination(FEED_ORDERING)
+        page_size = paginator.get_page_size(request)
+        recipe_ids = get_feed_rows(
+            request.user, paginator.decode_cursor(request, Recipe),
+            page_size + 1
+        )
+        recipes = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).in_bulk(recipe_ids)
+        page = paginator.paginate_rows(request, [
+            recipes[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in recipes
+        ], page_size)
+        serializer = RecipeReadSerializer(
+            page, many=True, context={'request': request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=('post',),
@@ -170,7 +463,9 @@ class CustomUserViewSet(UserViewSet):
                                        author=author).exists():
             raise exceptions.ValidationError('Подписка уже оформлена.')
 
-        Subscription.objects.create(user=user, author=author)
+        with transaction.atomic():
+            Subscription.objects.create(user=user, author=author)
+            subscribe_feed(user, author)
         serializer = self.get_serializer(author)
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -185,5 +480,16 @@ class CustomUserViewSet(UserViewSet):
             return Response(
                 {'errors': 'Нет такой подписки'},
                 status=status.HTTP_400_BAD_REQUEST)
-        subscription.delete()
+        with transaction.atomic():
+            subscription.delete()
+            unsubscribe_feed(user, author)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MetricsView(APIView):
+    """Гистограммы запросов всех процессов в формате Prometheus."""
+    permission_classes = (MetricsPermission,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        return Response(metrics_registry.render())
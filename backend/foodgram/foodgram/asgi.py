@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
+from django.core.exceptions import ImproperlyConfigured
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+# Асинхронные представления включает точка входа, а не окружение.
+os.environ['SERVER_MODE'] = 'asgi'
 
 application = get_asgi_application()
+
+if not settings.ASYNC_VIEWS:
+    raise ImproperlyConfigured(
+        'Настройки загружены до foodgram.asgi с SERVER_MODE='
+        f'{settings.SERVER_MODE}: под ASGI нужен SERVER_MODE=asgi.'
+    )
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,6 +39,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -61,6 +63,10 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 
+# Реплики только для чтения: в режиме DEBUG - файлы SQLite через запятую
+# (например, копия db.sqlite3), иначе - хосты PostgreSQL вида host[:port].
+DB_REPLICAS = [replica for replica in os.getenv('DB_REPLICAS', default='').split(',') if replica]
+
 if DEBUG:
     DATABASES = {
         'default': {
@@ -68,6 +74,12 @@ if DEBUG:
             'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
         }
     }
+    for number, name in enumerate(DB_REPLICAS, 1):
+        DATABASES[f'replica_{number}'] = {
+            **DATABASES['default'],
+            'NAME': os.path.join(BASE_DIR, name),
+            'TEST': {'MIRROR': 'default'},
+        }
 else:
     DATABASES = {
         'default': {
@@ -79,6 +91,35 @@ else:
             'PORT': os.getenv('DB_PORT', default='5432')
         }
     }
+    for number, replica in enumerate(DB_REPLICAS, 1):
+        host, _, port = replica.partition(':')
+        DATABASES[f'replica_{number}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+            'TEST': {'MIRROR': 'default'},
+        }
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+# Выбор реплики: round-robin или least-loaded.
+DATABASE_REPLICA_SELECTION = os.getenv('DATABASE_REPLICA_SELECTION', default='round-robin')
+# Сколько секунд после изменения пользователь читает с основной БД.
+DATABASE_STICKY_SECONDS = int(os.getenv('DATABASE_STICKY_SECONDS', default=5))
+
+# Поколения кеша ответов, версии индексов в памяти, метрики и привязка
+# к основной БД должны быть общими для всех воркеров, поэтому вне DEBUG
+# по умолчанию используется memcached. LocMemCache у каждого процесса
+# свой и допустим только с одним воркером (см. gunicorn.conf.py).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache' if DEBUG else 'django.core.cache.backends.memcached.PyMemcacheCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram' if DEBUG else 'memcached:11211'),
+    }
+}
+
+RECIPES_CACHE_TIMEOUT = int(os.getenv('RECIPES_CACHE_TIMEOUT', default=300))
+
+REFERENCE_DATA_MAX_AGE = int(os.getenv('REFERENCE_DATA_MAX_AGE', default=3600))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -109,6 +150,35 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', default=10 * 1024 * 1024))
+RECIPE_BATCH_MAX_SIZE = int(os.getenv('RECIPE_BATCH_MAX_SIZE', default=200))
+
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', default='russian')
+
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', default=1000))
+FEED_BACKFILL_LIMIT = int(os.getenv('FEED_BACKFILL_LIMIT', default=100))
+
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', default=500))
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', default=5))
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', default=15))
+METRICS_MAX_WORKERS = int(os.getenv('METRICS_MAX_WORKERS', default=64))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+# Режим сервера: wsgi (синхронные воркеры gunicorn) или asgi (воркеры
+# uvicorn с асинхронными представлениями справочников и рецептов).
+# foodgram.wsgi и foodgram.asgi задают его сами до загрузки настроек и
+# не запускаются, если настройки уже загружены с другим режимом.
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
+ASYNC_ORM_WORKERS = int(os.getenv('ASYNC_ORM_WORKERS', default=10))
+
+PROFILING_DIR = os.getenv('PROFILING_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0))
+PROFILING_SAMPLE_INTERVAL = float(os.getenv('PROFILING_SAMPLE_INTERVAL', default=0.001))
+
+IMAGE_VARIANTS_WORKERS = int(os.getenv('IMAGE_VARIANTS_WORKERS', default=0 if DEBUG else 2))
+THUMBNAIL_QUALITY = 80
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+# Синхронные представления включает точка входа, а не окружение.
+os.environ['SERVER_MODE'] = 'wsgi'
 
 application = get_wsgi_application()
+
+if settings.ASYNC_VIEWS:
+    raise ImproperlyConfigured(
+        'Настройки загружены до foodgram.wsgi с SERVER_MODE='
+        f'{settings.SERVER_MODE}: под WSGI нужен SERVER_MODE=wsgi.'
+    )
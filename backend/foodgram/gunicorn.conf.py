@@ -0,0 +1,31 @@
+import os
+import sys
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+
+# SERVER_MODE=asgi запускает воркеры uvicorn: медленные клиенты и загрузки
+# не занимают воркер целиком, а представления с БД выполняются в пуле
+# потоков размером ASYNC_ORM_WORKERS.
+if os.getenv('SERVER_MODE', default='wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+
+def on_starting(server):
+    """Не запускает несколько воркеров с кешем в памяти процесса.
+
+    Через кеш воркеры узнают об изменениях данных, поэтому с LocMemCache
+    остальные воркеры отдавали бы устаревшие ответы.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.conf import settings
+
+    backend = settings.CACHES['default']['BACKEND']
+    if server.cfg.workers > 1 and backend.endswith('.LocMemCache'):
+        server.log.error(
+            'LocMemCache не общий для воркеров: задайте CACHE_BACKEND '
+            '(например, memcached) или запустите один воркер.'
+        )
+        sys.exit(1)
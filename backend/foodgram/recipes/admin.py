@@ -15,7 +15,8 @@ class RecipeTagsInLine(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'text', 'pub_date', 'author')
+    list_display = ('id', 'name', 'text', 'pub_date', 'author',
+                    'favorites_count', 'shopping_cart_count')
     search_fields = ('name', 'author')
     inlines = (RecipeIngredientsInLine, RecipeTagsInLine)
 
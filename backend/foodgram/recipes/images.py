@@ -0,0 +1,75 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from api.cache import invalidate_recipes_cache
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import get_thumbnail
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    'preview': '160x160',
+    'card': '480x320',
+    'detail': '1024x768',
+}
+IMAGE_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+executor = None
+if settings.IMAGE_VARIANTS_WORKERS:
+    executor = ThreadPoolExecutor(
+        max_workers=settings.IMAGE_VARIANTS_WORKERS,
+        thread_name_prefix='image-variants'
+    )
+
+
+def build_image_variants(recipe_id):
+    """Создает уменьшенные копии изображения рецепта и сохраняет их имена."""
+    from recipes.models import Recipe
+
+    try:
+        recipe = Recipe.objects.only('image').get(pk=recipe_id)
+        variants = {'source': recipe.image.name}
+        for variant, geometry in IMAGE_VARIANTS.items():
+            variants[variant] = {}
+            for extension, image_format in IMAGE_FORMATS.items():
+                thumbnail = get_thumbnail(
+                    recipe.image, geometry, crop='center',
+                    format=image_format, quality=settings.THUMBNAIL_QUALITY
+                )
+                variants[variant][extension] = thumbnail.name
+                variants[variant]['width'] = thumbnail.width
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=recipe.image.name
+        ).update(image_variants=variants)
+        if updated:
+            # update() не отправляет сигналов, а ссылки на копии входят
+            # в закешированные ответы.
+            invalidate_recipes_cache()
+    except Exception:
+        logger.exception('Не удалось создать копии изображения рецепта %s',
+                         recipe_id)
+    finally:
+        if executor is not None:
+            connections.close_all()
+
+
+def schedule_image_variants(recipe):
+    """Ставит создание копий в очередь после фиксации транзакции.
+
+    Без пула потоков (IMAGE_VARIANTS_WORKERS = 0) копии создаются сразу
+    после фиксации, что нужно для SQLite, не допускающей параллельной записи.
+    """
+    if not recipe.image:
+        return
+    if recipe.image_variants.get('source') == recipe.image.name:
+        return
+    if executor is None:
+        transaction.on_commit(lambda: build_image_variants(recipe.pk))
+        return
+    transaction.on_commit(
+        lambda: executor.submit(build_image_variants, recipe.pk)
+    )
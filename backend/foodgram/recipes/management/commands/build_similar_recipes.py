@@ -0,0 +1,149 @@
+import time
+from itertools import chain
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from recipes.models import Favorite, SimilarRecipe, SimilarRecipesBuild
+from scipy import sparse
+
+
+def load_favorites_matrix(last_favorite_id):
+    """Разреженная матрица пользователь x рецепт из избранного.
+
+    Возвращает id рецептов в порядке столбцов и матрицу в формате CSC.
+    """
+    pairs = np.fromiter(
+        chain.from_iterable(Favorite.objects.filter(
+            id__lte=last_favorite_id
+        ).order_by().values_list('user_id', 'recipe_id').iterator()),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    users, user_index = np.unique(pairs[:, 0], return_inverse=True)
+    recipes, recipe_index = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csc_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (user_index, recipe_index)),
+        shape=(len(users), len(recipes))
+    )
+    return recipes, matrix
+
+
+def get_affected_columns(matrix, recipes, changed_recipe_ids):
+    """Столбцы рецептов, чьи соседи могли измениться.
+
+    Меняется близость только пар с рецептом из нового избранного,
+    поэтому пересчитываются эти рецепты и все, у кого с ними есть
+    общие пользователи.
+    """
+    changed = np.flatnonzero(np.isin(recipes, changed_recipe_ids))
+    if not len(changed):
+        return changed
+    users = np.unique(matrix[:, changed].tocoo().row)
+    return np.unique(matrix.tocsr()[users].tocoo().col)
+
+
+def get_neighbours(matrix, popularity, columns, top_k, min_common):
+    """Top-K косинусных соседей для пакета столбцов.
+
+    Возвращает массивы (строка пакета, столбец соседа, близость),
+    упорядоченные по строке и убыванию близости.
+    """
+    common = (matrix[:, columns].T @ matrix).tocsr()
+    common[np.arange(len(columns)), columns] = 0
+    common.data[common.data < min_common] = 0
+    common.eliminate_zeros()
+    rows = np.repeat(np.arange(len(columns)), np.diff(common.indptr))
+    norms = np.sqrt(popularity)
+    scores = common.data / (norms[columns][rows] * norms[common.indices])
+    order = np.lexsort((-scores, rows))
+    rows = rows[order]
+    ranks = np.arange(len(order)) - common.indptr[rows]
+    keep = order[ranks < top_k]
+    return rows[ranks < top_k], common.indices[keep], scores[keep]
+
+
+class Command(BaseCommand):
+    help = ('Рассчитывает похожие рецепты по совместному избранному '
+            '(косинусная близость) и сохраняет top-K для каждого рецепта.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument(
+            '--min-common', type=int, default=2,
+            help='минимальное число общих пользователей у пары рецептов'
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='пересчитать все рецепты; нужен и для учета удаления '
+                 'из избранного'
+        )
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        batch_size = options['batch_size']
+        min_common = options['min_common']
+        if min(top_k, batch_size, min_common) < 1:
+            raise CommandError(
+                'Параметры --top-k, --batch-size и --min-common должны '
+                'быть больше 0.'
+            )
+
+        started = time.monotonic()
+        last_favorite_id = Favorite.objects.aggregate(
+            last_id=Max('id')
+        )['last_id'] or 0
+        previous = SimilarRecipesBuild.objects.first()
+        full = options['full'] or previous is None
+        if not full and previous.last_favorite_id == last_favorite_id:
+            self.stdout.write('Нового избранного нет.')
+            return
+
+        recipes, matrix = load_favorites_matrix(last_favorite_id)
+        popularity = np.asarray(matrix.sum(axis=0)).ravel()
+        if full:
+            columns = np.arange(len(recipes))
+        else:
+            changed_recipe_ids = list(Favorite.objects.filter(
+                id__gt=previous.last_favorite_id, id__lte=last_favorite_id
+            ).order_by().values_list('recipe_id', flat=True).distinct())
+            columns = get_affected_columns(
+                matrix, recipes, changed_recipe_ids
+            )
+
+        for start in range(0, len(columns), batch_size):
+            batch = columns[start:start + batch_size]
+            rows, neighbours, scores = get_neighbours(
+                matrix, popularity, batch, top_k, min_common
+            )
+            with transaction.atomic():
+                SimilarRecipe.objects.filter(
+                    recipe__in=recipes[batch].tolist()
+                ).delete()
+                SimilarRecipe.objects.bulk_create(
+                    SimilarRecipe(
+                        recipe_id=recipe_id, similar_id=similar_id,
+                        score=score
+                    )
+                    for recipe_id, similar_id, score in zip(
+                        recipes[batch][rows].tolist(),
+                        recipes[neighbours].tolist(),
+                        scores.tolist()
+                    )
+                )
+        with transaction.atomic():
+            if full:
+                SimilarRecipe.objects.exclude(
+                    recipe__in=Favorite.objects.values('recipe')
+                ).delete()
+            SimilarRecipesBuild.objects.create(
+                last_favorite_id=last_favorite_id,
+                recipes_updated=len(columns),
+                full=full
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {len(columns)} '
+            f'({"полный" if full else "инкрементальный"} расчет). '
+            f'{time.monotonic() - started:.2f} с.'
+        ))
@@ -0,0 +1,154 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import (Count, Exists, F, IntegerField, OuterRef, Q,
+                              Subquery, Sum)
+from django.db.models.functions import Coalesce
+from recipes.models import (Favorite, Recipe, RecipeIngredients, RecipeTags,
+                            ShoppingCart, Tag)
+from users.models import Subscription
+
+User = get_user_model()
+
+PAGE_SIZE = 6
+
+# Признаки полного просмотра таблицы и сортировки в выводе EXPLAIN.
+PLAN_PATTERNS = {
+    'postgresql': (
+        re.compile(r'Seq Scan on (\w+)'),
+        re.compile(r'\bSort\b'),
+    ),
+    'sqlite': (
+        re.compile(r'\bSCAN (?:TABLE )?(?!CONSTANT\b)(\w+)(?!.*\bUSING\b)'),
+        re.compile(r'USE TEMP B-TREE'),
+    ),
+}
+
+
+def get_canonical_queries(user, tag):
+    """Запросы, которые api.views и api.filters выполняют на каждой
+    странице: имя, queryset и допустима ли сортировка в плане."""
+    latest = Recipe.objects.order_by('-pub_date', '-id').first()
+    return (
+        ('лента рецептов',
+         Recipe.objects.with_user_flags(user)[:PAGE_SIZE], False),
+        ('лента по курсору',
+         Recipe.objects.filter(
+             Q(pub_date__lte=latest.pub_date)
+             & (Q(pub_date__lt=latest.pub_date)
+                | Q(pub_date=latest.pub_date, id__lt=latest.id))
+         ).order_by('-pub_date', '-id')[:PAGE_SIZE], False),
+        ('рецепты автора',
+         Recipe.objects.filter(author=latest.author_id)[:PAGE_SIZE], False),
+        ('фильтр по тегам',
+         Recipe.objects.filter(Exists(RecipeTags.objects.filter(
+             recipe=OuterRef('pk'), tag=tag
+         )))[:PAGE_SIZE], False),
+        ('фильтр избранного',
+         Recipe.objects.filter(Exists(Favorite.objects.filter(
+             user=user, recipe=OuterRef('pk')
+         )))[:PAGE_SIZE], False),
+        ('фильтр списка покупок',
+         Recipe.objects.filter(Exists(ShoppingCart.objects.filter(
+             user=user, recipe=OuterRef('pk')
+         )))[:PAGE_SIZE], False),
+        ('ингредиенты рецептов страницы',
+         RecipeIngredients.objects.select_related('ingredient').filter(
+             recipe__in=[latest.pk]
+         ), False),
+        # Сортируются только теги рецептов одной страницы.
+        ('теги рецептов страницы',
+         Tag.objects.filter(recipetags__recipe__in=[latest.pk]), True),
+        # Сортируются уже сгруппированные строки списка покупок.
+        ('список покупок',
+         RecipeIngredients.objects.filter(
+             recipe__in_shopping_list__user=user
+         ).values(
+             name=F('ingredient__name'),
+             unit=F('ingredient__measurement_unit')
+         ).annotate(amount=Sum('amount')).order_by('name'), True),
+        ('подписки',
+         User.objects.filter(id__in=Subscription.objects.filter(
+             user=user
+         ).values('author')).annotate(
+             recipes_count=Coalesce(Subquery(
+                 Recipe.objects.filter(author=OuterRef('pk')).order_by()
+                 .values('author').annotate(total=Count('id'))
+                 .values('total'),
+                 output_field=IntegerField()
+             ), 0)
+         ).order_by('id')[:PAGE_SIZE], False),
+    )
+
+
+class Command(BaseCommand):
+    help = ('Проверяет планы основных запросов API через EXPLAIN и '
+            'завершается с ошибкой при полном просмотре таблицы или '
+            'сортировке.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя для запросов (по умолчанию - с '
+                 'наибольшим числом избранного)'
+        )
+        parser.add_argument(
+            '--natural', action='store_true',
+            help='не запрещать PostgreSQL полный просмотр и сортировку; '
+                 'на небольшой базе планировщик выберет их сам'
+        )
+
+    def get_user(self, user_id):
+        if user_id is not None:
+            user = User.objects.filter(pk=user_id).first()
+        else:
+            user = User.objects.annotate(
+                favorites_total=Count('favorites')
+            ).order_by('-favorites_total', 'id').first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+        return user
+
+    def handle(self, *args, **options):
+        patterns = PLAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(
+                f'EXPLAIN для {connection.vendor} не поддерживается.'
+            )
+        tag = Tag.objects.first()
+        if tag is None or not Recipe.objects.exists():
+            raise CommandError('В базе нет рецептов или тегов.')
+        user = self.get_user(options['user'])
+        scan_pattern, sort_pattern = patterns
+
+        failed = 0
+        with transaction.atomic():
+            if connection.vendor == 'postgresql' and not options['natural']:
+                # Запрещенный метод получает огромную стоимость, поэтому
+                # остается в плане, только если индекса для него нет.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute('SET LOCAL enable_sort = off')
+            for name, queryset, allow_sort in get_canonical_queries(
+                user, tag
+            ):
+                plan = queryset.explain()
+                problems = [
+                    f'полный просмотр {table}'
+                    for table in scan_pattern.findall(plan)
+                ]
+                if not allow_sort and sort_pattern.search(plan):
+                    problems.append('сортировка')
+                if problems:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'{name}: {", ".join(problems)}'
+                    ))
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(f'{name}: OK')
+        if failed:
+            raise CommandError(f'Запросов с неудачным планом: {failed}.')
+        self.stdout.write(self.style.SUCCESS('Все планы используют индексы.'))
@@ -0,0 +1,408 @@
+import csv
+import io
+import os
+import time
+from datetime import timedelta
+from itertools import repeat
+
+import numpy as np
+from api.cache import invalidate_recipes_cache
+from api.feed import reset_high_follower_authors
+from api.pantry import invalidate_pantry_index
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+from recipes.models import (Favorite, FeedItem, Ingredient, Recipe,
+                            RecipeIngredients, RecipeTags, ShoppingCart, Tag)
+from recipes.search import (SEARCH_TABLE, create_search_table, is_postgresql,
+                            is_sqlite, normalize_document)
+from users.models import Subscription
+
+User = get_user_model()
+
+DEFAULT_INGREDIENTS = os.path.join(settings.BASE_DIR, 'data',
+                                   'ingredients.json')
+IMAGE_NAME = 'recipes/generated.jpg'
+PASSWORD = 'generated-password'
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F2C94C', 'dessert'),
+    ('Выпечка', '#BB6BD9', 'bakery'),
+)
+DISHES = ('Суп', 'Салат', 'Рагу', 'Запеканка', 'Пирог', 'Паста',
+          'Омлет', 'Каша', 'Котлеты', 'Рулет')
+UNITS = {'г': 50, 'кг': 1, 'мл': 100, 'л': 1, 'шт.': 2}
+
+
+def zipf_weights(count, exponent, rng):
+    """Вероятности по закону Ципфа, ранги случайно распределены по id."""
+    weights = 1 / np.arange(1, count + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def sample_pairs(rng, total, left, right, left_weights, right_weights,
+                 exclude_equal=False):
+    """Уникальные пары (left, right) с независимым выбором сторон.
+
+    Пары выбираются с запасом, повторы и совпадения отбрасываются;
+    при сильной асимметрии пар может получиться меньше total.
+    """
+    base = int(right.max()) + 1
+    pairs = np.empty(0, dtype=np.int64)
+    for _ in range(5):
+        need = total - len(pairs)
+        if need <= 0:
+            break
+        size = int(need * 1.2) + 16
+        keys = (
+            rng.choice(left, size, p=left_weights).astype(np.int64) * base
+            + rng.choice(right, size, p=right_weights)
+        )
+        if exclude_equal:
+            keys = keys[keys // base != keys % base]
+        pairs = np.unique(np.concatenate((pairs, keys)))
+    pairs = np.sort(rng.permutation(pairs)[:total])
+    return pairs // base, pairs % base
+
+
+def get_image():
+    """Общее изображение всех сгенерированных рецептов."""
+    if not default_storage.exists(IMAGE_NAME):
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 400), (226, 108, 45)).save(buffer, 'JPEG')
+        default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+    return IMAGE_NAME
+
+
+class Command(BaseCommand):
+    help = ('Создает нагрузочный набор данных: пользователей, рецепты, '
+            'избранное, списки покупок и подписки с неравномерной '
+            '(по Ципфу) популярностью.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=50000)
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, nargs=2, default=(3, 12),
+            metavar=('MIN', 'MAX')
+        )
+        parser.add_argument(
+            '--tags-per-recipe', type=int, nargs=2, default=(1, 3),
+            metavar=('MIN', 'MAX')
+        )
+        parser.add_argument('--favorites', type=int, default=500000)
+        parser.add_argument('--shopping-carts', type=int, default=50000)
+        parser.add_argument('--subscriptions', type=int, default=100000)
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='показатель закона Ципфа для популярности рецептов, '
+                 'авторов и ингредиентов'
+        )
+        parser.add_argument('--days', type=int, default=365,
+                            help='период публикации рецептов в днях')
+        parser.add_argument('--ingredients', default=DEFAULT_INGREDIENTS)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def write_rows(self, model, columns, count):
+        """Вставляет count строк; значения столбцов - последовательности
+        длины count или константы.
+
+        В PostgreSQL строки загружаются через COPY, в остальных СУБД -
+        пакетными INSERT без создания экземпляров моделей.
+        """
+        fields = {
+            field.attname: field for field in model._meta.concrete_fields
+        }
+        names = [fields[name].column for name in columns]
+        values = [
+            value if isinstance(value, (list, np.ndarray))
+            else repeat(fields[name].get_db_prep_save(value, connection))
+            for name, value in columns.items()
+        ]
+        rows = zip(*(
+            value.tolist() if isinstance(value, np.ndarray) else value
+            for value in values
+        ))
+        table = connection.ops.quote_name(model._meta.db_table)
+        column_list = ', '.join(map(connection.ops.quote_name, names))
+        started = time.monotonic()
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, count, self.batch_size):
+                batch = [row for _, row in zip(
+                    range(min(self.batch_size, count - start)), rows
+                )]
+                if is_postgresql():
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows(
+                        tuple(r'\N' if value is None else value
+                              for value in row)
+                        for row in batch
+                    )
+                    buffer.seek(0)
+                    cursor.copy_expert(
+                        f'COPY {table} ({column_list}) FROM STDIN '
+                        f"WITH (FORMAT csv, NULL '\\N')",
+                        buffer
+                    )
+                else:
+                    cursor.executemany(
+                        f'INSERT INTO {table} ({column_list}) VALUES '
+                        f'({", ".join(["%s"] * len(names))})',
+                        batch
+                    )
+        self.total += count
+        self.stdout.write(
+            f'{model._meta.db_table}: {count} строк, '
+            f'{time.monotonic() - started:.2f} с.'
+        )
+
+    def load_catalogue(self, path):
+        if not Ingredient.objects.exists():
+            if not os.path.exists(path):
+                raise CommandError(f'Файл ингредиентов не найден: {path}')
+            call_command('load_ingredients', path, stdout=self.stdout)
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )
+        ingredients = list(Ingredient.objects.order_by('id').values_list(
+            'id', 'name', 'measurement_unit'
+        ))
+        tags = np.array(Tag.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        return ingredients, tags
+
+    def create_users(self, ids):
+        usernames = [f'user{user_id}' for user_id in ids.tolist()]
+        self.write_rows(User, {
+            'id': ids,
+            'username': usernames,
+            'email': [f'{username}@example.com' for username in usernames],
+            'first_name': 'Пользователь',
+            'last_name': usernames,
+            'password': make_password(PASSWORD),
+            'is_active': True,
+            'is_staff': False,
+            'is_superuser': False,
+            'date_joined': timezone.now(),
+        }, len(ids))
+
+    def create_recipes(self, rng, options, ids, users, catalogue, tags,
+                       counters):
+        """Создает рецепты с ингредиентами и тегами; возвращает авторов
+        и даты публикации рецептов."""
+        count = len(ids)
+        skew = options['skew']
+        authors = rng.choice(users, count, p=zipf_weights(
+            len(users), skew, rng
+        ))
+
+        low, high = options['ingredients_per_recipe']
+        sizes = rng.integers(low, high + 1, count)
+        ingredient_keys = np.unique(
+            np.repeat(np.arange(count, dtype=np.int64), sizes)
+            * len(catalogue)
+            + rng.choice(len(catalogue), sizes.sum(), p=zipf_weights(
+                len(catalogue), skew, rng
+            ))
+        )
+        positions = ingredient_keys // len(catalogue)
+        ingredients = ingredient_keys % len(catalogue)
+        bounds = np.searchsorted(positions, np.arange(count + 1))
+
+        low, high = options['tags_per_recipe']
+        sizes = rng.integers(low, high + 1, count)
+        tag_keys = np.unique(
+            np.repeat(np.arange(count, dtype=np.int64), sizes) * len(tags)
+            + rng.integers(0, len(tags), sizes.sum())
+        )
+
+        names = []
+        texts = []
+        documents = []
+        for position, dish in enumerate(rng.choice(DISHES, count).tolist()):
+            parts = [
+                catalogue[index][1]
+                for index in ingredients[bounds[position]:
+                                         bounds[position + 1]].tolist()
+            ]
+            name = f'{dish} с ингредиентом «{parts[0]}»'
+            text = f'Приготовьте {dish.lower()} из: {", ".join(parts)}.'
+            names.append(name[:200])
+            texts.append(text)
+            documents.append(normalize_document(
+                '\n'.join((name, text, *parts))
+            ))
+
+        published = timezone.now() - timedelta(days=options['days'])
+        offsets = np.sort(rng.integers(0, options['days'] * 86400, count))
+        dates = [
+            connection.ops.adapt_datetimefield_value(
+                published + timedelta(seconds=offset)
+            )
+            for offset in offsets.tolist()
+        ]
+        favorites_count, shopping_cart_count = counters
+        self.write_rows(Recipe, {
+            'id': ids,
+            'name': names,
+            'text': texts,
+            'cooking_time': rng.integers(5, 180, count),
+            'image': get_image(),
+            'image_variants': {},
+            'pub_date': dates,
+            'updated_at': dates,
+            'author_id': authors,
+            'favorites_count': favorites_count,
+            'shopping_cart_count': shopping_cart_count,
+            'search_document': documents,
+        }, count)
+        if is_sqlite():
+            create_search_table()
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {SEARCH_TABLE} (rowid, document) '
+                    f'VALUES (%s, %s)',
+                    zip(ids.tolist(), documents)
+                )
+
+        units = np.array([
+            UNITS.get(unit, 1) for _, _, unit in catalogue
+        ])
+        ingredient_ids = np.array([
+            ingredient_id for ingredient_id, _, _ in catalogue
+        ])
+        self.write_rows(RecipeIngredients, {
+            'recipe_id': ids[positions],
+            'ingredient_id': ingredient_ids[ingredients],
+            'amount': units[ingredients] * rng.integers(1, 10,
+                                                        len(ingredients)),
+        }, len(ingredient_keys))
+        self.write_rows(RecipeTags, {
+            'recipe_id': ids[tag_keys // len(tags)],
+            'tag_id': tags[tag_keys % len(tags)],
+        }, len(tag_keys))
+        return authors, dates
+
+    def create_feed(self, recipes, authors, dates, followers, following):
+        """Заполняет ленты подписок последними рецептами авторов, как
+        при подписке; авторы с большим числом подписчиков пропускаются."""
+        followers_count = np.bincount(following)
+        keep = followers_count[following] <= settings.FEED_FANOUT_MAX_FOLLOWERS
+        followers, following = followers[keep], following[keep]
+        if not len(following):
+            return
+        # Рецепты сгруппированы по автору в порядке публикации.
+        order = np.argsort(authors, kind='stable')
+        counts = np.bincount(authors, minlength=following.max() + 1)
+        ends = np.cumsum(counts)
+        sizes = np.minimum(counts[following], settings.FEED_BACKFILL_LIMIT)
+        rows = np.repeat(np.arange(len(following)), sizes)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(sizes) - sizes,
+                                                   sizes)
+        positions = order[ends[following[rows]] - 1 - offsets]
+        self.write_rows(FeedItem, {
+            'user_id': followers[rows],
+            'recipe_id': recipes[positions],
+            'author_id': following[rows],
+            'pub_date': [dates[position] for position in positions.tolist()],
+        }, len(rows))
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        if self.batch_size < 1:
+            raise CommandError('Размер пакета должен быть больше 0.')
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError(
+                'Нужно не меньше двух пользователей и одного рецепта.'
+            )
+        for option in ('ingredients_per_recipe', 'tags_per_recipe'):
+            low, high = options[option]
+            if not 1 <= low <= high:
+                raise CommandError(
+                    f'Некорректный диапазон --{option.replace("_", "-")}.'
+                )
+        if options['skew'] <= 0 or options['days'] < 1:
+            raise CommandError('Параметры --skew и --days должны быть '
+                               'больше 0.')
+
+        started = time.monotonic()
+        self.total = 0
+        rng = np.random.default_rng(options['seed'])
+        skew = options['skew']
+        catalogue, tags = self.load_catalogue(options['ingredients'])
+        if not catalogue:
+            raise CommandError('В базе нет ингредиентов.')
+
+        first_user_id = (User.objects.aggregate(last_id=Max('id'))['last_id']
+                         or 0) + 1
+        first_recipe_id = (Recipe.objects.aggregate(
+            last_id=Max('id')
+        )['last_id'] or 0) + 1
+        users = np.arange(first_user_id, first_user_id + options['users'])
+        recipes = np.arange(first_recipe_id,
+                            first_recipe_id + options['recipes'])
+
+        # Избранное и корзина выбираются до вставки рецептов, чтобы
+        # сразу записать в рецепты счетчики.
+        activity = zipf_weights(len(users), skew / 2, rng)
+        popularity = zipf_weights(len(recipes), skew, rng)
+        favorites = sample_pairs(rng, options['favorites'], users, recipes,
+                                 activity, popularity)
+        carts = sample_pairs(rng, options['shopping_carts'], users, recipes,
+                             activity, popularity)
+        counters = tuple(
+            np.bincount(recipe_ids - first_recipe_id,
+                        minlength=len(recipes))
+            for _, recipe_ids in (favorites, carts)
+        )
+
+        self.create_users(users)
+        authors, dates = self.create_recipes(rng, options, recipes, users,
+                                             catalogue, tags, counters)
+        for model, (user_ids, recipe_ids) in (
+            (Favorite, favorites), (ShoppingCart, carts)
+        ):
+            self.write_rows(model, {
+                'user_id': user_ids,
+                'recipe_id': recipe_ids,
+            }, len(user_ids))
+        followers, following = sample_pairs(
+            rng, options['subscriptions'], users, users,
+            zipf_weights(len(users), skew / 2, rng),
+            zipf_weights(len(users), skew, rng),
+            exclude_equal=True
+        )
+        self.write_rows(Subscription, {
+            'user_id': followers,
+            'author_id': following,
+        }, len(followers))
+        self.create_feed(recipes, authors, dates, followers, following)
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), (User, Recipe)
+            ):
+                cursor.execute(sql)
+        invalidate_recipes_cache()
+        invalidate_pantry_index()
+        reset_high_follower_authors()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {self.total}. {elapsed:.2f} с, '
+            f'{self.total / max(elapsed, 1e-6):.0f} строк/с.'
+        ))
@@ -0,0 +1,99 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from api.search import ingredient_index
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import Ingredient
+
+DEFAULT_PATH = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Потоково читает JSON-массив объектов без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON-файл.')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        fields = item.get('fields', item)
+        yield fields['name'], fields['measurement_unit']
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты из CSV или JSON пакетами. Загрузка '
+            'только добавляет: существующие ингредиенты не изменяются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='Формат файла, по умолчанию определяется по расширению.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path)[1].lstrip('.').lower()
+        readers = {'csv': read_csv, 'json': read_json}
+        if file_format not in readers:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пакета должен быть больше 0.')
+
+        started = time.monotonic()
+        total = 0
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = readers[file_format](file)
+            with transaction.atomic():
+                count_before = Ingredient.objects.count()
+                while True:
+                    batch = [
+                        Ingredient(name=name.strip(),
+                                   measurement_unit=unit.strip())
+                        for name, unit in islice(rows, batch_size)
+                    ]
+                    if not batch:
+                        break
+                    # Ингредиент - пара (название, единица): одно название
+                    # бывает с несколькими единицами, а на существующие
+                    # записи ссылаются рецепты. Поэтому строка с новой
+                    # единицей добавляет ингредиент, а не меняет старый.
+                    Ingredient.objects.bulk_create(
+                        batch, batch_size=batch_size, ignore_conflicts=True
+                    )
+                    total += len(batch)
+                created = Ingredient.objects.count() - count_before
+                transaction.on_commit(ingredient_index.invalidate)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {total}, добавлено: {created}, '
+            f'пропущено существующих: {total - created}. '
+            f'{elapsed:.2f} с, {total / max(elapsed, 1e-6):.0f} строк/с.'
+        ))
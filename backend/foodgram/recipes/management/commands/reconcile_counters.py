@@ -0,0 +1,62 @@
+import time
+
+from api.counters import cache_recipe_counters
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+def count_subquery(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe'
+        ).annotate(total=Count('id')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики избранного и списков покупок '
+            'у рецептов пакетами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пакета должен быть больше 0.')
+
+        started = time.monotonic()
+        last_id = 0
+        checked = repaired = 0
+        while True:
+            ids = list(Recipe.objects.filter(id__gt=last_id).order_by(
+                'id'
+            ).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+            with transaction.atomic():
+                drifted = Recipe.objects.filter(id__in=ids).annotate(
+                    real_favorites_count=count_subquery(Favorite),
+                    real_shopping_cart_count=count_subquery(ShoppingCart),
+                ).filter(
+                    ~Q(favorites_count=F('real_favorites_count'))
+                    | ~Q(shopping_cart_count=F('real_shopping_cart_count'))
+                ).values_list('id', flat=True)
+                drifted = list(drifted)
+                repaired += Recipe.objects.filter(id__in=drifted).update(
+                    favorites_count=count_subquery(Favorite),
+                    shopping_cart_count=count_subquery(ShoppingCart),
+                )
+            # Счетчики в ответах из кеша берутся из отдельных ключей.
+            if drifted:
+                cache_recipe_counters(drifted)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено рецептов: {checked}, исправлено: {repaired}. '
+            f'{time.monotonic() - started:.2f} с.'
+        ))
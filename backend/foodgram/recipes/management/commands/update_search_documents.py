@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Recipe
+from recipes.search import create_search_table, update_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковые документы рецептов пакетами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пакета должен быть больше 0.')
+
+        started = time.monotonic()
+        create_search_table()
+        last_id = 0
+        updated = 0
+        while True:
+            ids = list(Recipe.objects.filter(id__gt=last_id).order_by(
+                'id'
+            ).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            update_search_documents(ids)
+            updated += len(ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено документов: {updated}. '
+            f'{time.monotonic() - started:.2f} с.'
+        ))
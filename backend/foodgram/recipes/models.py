@@ -1,6 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.functions import RowNumber
+from recipes.search import SearchIndex
+from users.models import Subscription
 
 User = get_user_model()
 
@@ -60,6 +63,56 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты рецептов."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredients.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def with_user_flags(self, user):
+        """Аннотирует рецепты флагами избранного, корзины и подписки."""
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_author_subscribed=models.Exists(Subscription.objects.filter(
+                user=user, author=models.OuterRef('author')
+            )),
+        )
+
+    def limit_per_author(self, limit):
+        """Не более limit последних рецептов каждого автора одним запросом.
+
+        Фильтрация по оконной функции ROW_NUMBER() выполняется во внешнем
+        запросе, поэтому возвращается RawQuerySet.
+        """
+        ranked = self.annotate(author_position=models.Window(
+            expression=RowNumber(),
+            partition_by=models.F('author'),
+            order_by=models.F('pub_date').desc()
+        ))
+        sql, params = ranked.query.sql_with_params()
+        return self.model.objects.raw(
+            f'SELECT * FROM ({sql}) ranked '
+            f'WHERE ranked.author_position <= %s '
+            f'ORDER BY ranked.author_position',
+            (*params, limit)
+        )
+
+
 class Recipe(models.Model):
     name = models.CharField(
         max_length=200,
@@ -87,10 +140,20 @@ class Recipe(models.Model):
         help_text='Изображение для рецепта',
         upload_to='recipes/',
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения',
+    )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации рецепта',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения рецепта',
+        auto_now=True,
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -104,12 +167,45 @@ class Recipe(models.Model):
         verbose_name='Теги рецепта',
         help_text='Теги рецепта',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+        help_text='Сколько раз рецепт добавлен в избранное',
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок',
+        help_text='Сколько раз рецепт добавлен в список покупок',
+    )
+    search_document = models.TextField(
+        default='',
+        blank=True,
+        editable=False,
+        verbose_name='Поисковый документ',
+        help_text='Название, описание и ингредиенты рецепта для поиска',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
 
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+            SearchIndex(name='recipe_search_idx'),
+        )
+
     def __str__(self):
         return self.name
 
@@ -135,6 +231,13 @@ class RecipeIngredients(models.Model):
         verbose_name = 'ингредиенты'
         verbose_name_plural = 'Ингредиенты'
 
+        indexes = (
+            models.Index(
+                fields=('recipe', 'ingredient'),
+                name='recipe_ingredient_idx'
+            ),
+        )
+
     def __str__(self):
         return f'В рецепте {self.recipe} есть ингредиент {self.ingredient}'
 
@@ -156,6 +259,13 @@ class RecipeTags(models.Model):
         verbose_name = 'теги'
         verbose_name_plural = 'Теги'
 
+        indexes = (
+            models.Index(
+                fields=('tag', 'recipe'),
+                name='tag_recipe_idx'
+            ),
+        )
+
     def __str__(self):
         return f'У рецепта {self.recipe} есть тег {self.tag}'
 
@@ -218,3 +328,110 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'Рецепт {self.recipe} в списке покупок у {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """Заранее рассчитанные похожие рецепты по совместному избранному."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(
+        verbose_name='Косинусная близость',
+    )
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'Рецепт {self.similar} похож на {self.recipe}'
+
+
+class SimilarRecipesBuild(models.Model):
+    """Запуск расчета похожих рецептов и учтенная часть избранного."""
+    last_favorite_id = models.PositiveIntegerField(
+        verbose_name='Последняя учтенная запись избранного',
+    )
+    recipes_updated = models.PositiveIntegerField(
+        verbose_name='Пересчитано рецептов',
+    )
+    full = models.BooleanField(
+        verbose_name='Полный пересчет',
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата расчета',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'расчет похожих рецептов'
+        verbose_name_plural = 'Расчеты похожих рецептов'
+
+    def __str__(self):
+        return f'Расчет похожих рецептов от {self.created_at}'
+
+
+class FeedItem(models.Model):
+    """Рецепт в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_item'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_item_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_item_user_author_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'Рецепт {self.recipe} в ленте {self.user}'
@@ -0,0 +1,172 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'recipes_recipe_search'
+SEARCH_BATCH_SIZE = 500
+SEARCH_TABLE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING '
+    f"fts5(document, tokenize='unicode61 remove_diacritics 2')"
+)
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def is_sqlite():
+    return connection.vendor == 'sqlite'
+
+
+def normalize_document(value):
+    return value.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def get_search_vector():
+    """Выражение tsvector, по которому построен GIN-индекс рецептов."""
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('search_document', config=settings.SEARCH_CONFIG)
+
+
+class SearchIndex(models.Index):
+    """Полнотекстовый индекс поискового документа рецепта.
+
+    Индекс объявлен в модели для всех СУБД, поэтому миграции одинаковы
+    на любом окружении, а SQL зависит от БД, к которой они применяются:
+    в PostgreSQL это GIN-индекс по tsvector, в SQLite - таблица FTS5,
+    в остальных СУБД - обычный индекс.
+    """
+
+    def __init__(self, *, name, fields=('search_document',), **kwargs):
+        super().__init__(fields=fields, name=name, **kwargs)
+
+    def create_sql(self, model, schema_editor, **kwargs):
+        vendor = schema_editor.connection.vendor
+        if vendor == 'postgresql':
+            from django.contrib.postgres.indexes import GinIndex
+            return GinIndex(get_search_vector(), name=self.name).create_sql(
+                model, schema_editor, **kwargs
+            )
+        if vendor == 'sqlite':
+            return SEARCH_TABLE_SQL
+        return super().create_sql(model, schema_editor, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor == 'sqlite':
+            return f'DROP TABLE IF EXISTS {SEARCH_TABLE}'
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+
+def create_search_table():
+    """Создает таблицу FTS5 для поиска в SQLite, если ее еще нет."""
+    if not is_sqlite():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_TABLE_SQL)
+
+
+def update_search_documents(recipe_ids):
+    """Пересобирает поисковые документы рецептов из названия, описания
+    и названий ингредиентов."""
+    from recipes.models import Recipe, RecipeIngredients
+
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), SEARCH_BATCH_SIZE):
+        batch = recipe_ids[start:start + SEARCH_BATCH_SIZE]
+        ingredients = defaultdict(list)
+        for recipe_id, name in RecipeIngredients.objects.filter(
+            recipe__in=batch
+        ).order_by('id').values_list('recipe_id', 'ingredient__name'):
+            ingredients[recipe_id].append(name)
+        recipes = [
+            Recipe(id=recipe_id, search_document=normalize_document(
+                '\n'.join((name, text, *ingredients[recipe_id]))
+            ))
+            for recipe_id, name, text in Recipe.objects.filter(
+                id__in=batch
+            ).values_list('id', 'name', 'text')
+        ]
+        with transaction.atomic():
+            Recipe.objects.bulk_update(recipes, ('search_document',))
+            if is_sqlite():
+                delete_search_documents(batch)
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        f'INSERT INTO {SEARCH_TABLE} (rowid, document) '
+                        f'VALUES (%s, %s)',
+                        [(recipe.id, recipe.search_document)
+                         for recipe in recipes]
+                    )
+
+
+def delete_search_documents(recipe_ids):
+    if not is_sqlite():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+            [(recipe_id,) for recipe_id in recipe_ids]
+        )
+
+
+def schedule_search_documents(recipe_ids):
+    """Обновляет документы после фиксации транзакции, когда ингредиенты
+    рецепта уже сохранены."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: update_search_documents(recipe_ids))
+
+
+def get_fts_query(query):
+    """Запрос FTS5: все слова обязательны и ищутся по началу."""
+    words = normalize_document(query).split()
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def search_recipes(queryset, query):
+    """Отбирает рецепты по запросу и сортирует их по релевантности.
+
+    В PostgreSQL используется tsvector с GIN-индексом, в SQLite - таблица
+    FTS5 с ранжированием bm25, в остальных СУБД - поиск подстроки.
+    """
+    if not query.strip():
+        return queryset
+    if is_postgresql():
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        search_query = SearchQuery(
+            normalize_document(query), config=settings.SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        vector = get_search_vector()
+        return queryset.annotate(
+            search_vector=vector,
+            search_rank=SearchRank(vector, search_query)
+        ).filter(search_vector=search_query).order_by(
+            '-search_rank', '-pub_date'
+        )
+    if is_sqlite():
+        # Рецепты отбираются некоррелированным подзапросом, в котором
+        # MATCH выполняется один раз. Оценки bm25 тоже считаются одним
+        # поиском: LIMIT -1 OFFSET 0 не дает SQLite встроить подзапрос
+        # в коррелированный, поэтому его результат индексируется один раз,
+        # а не пересчитывается поиском по индексу для каждого рецепта.
+        # bm25 возвращает отрицательную оценку: чем меньше, тем лучше.
+        fts_query = get_fts_query(query)
+        table = queryset.model._meta.db_table
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+            (fts_query,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT ranks.rank FROM (SELECT rowid AS id, '
+            f'-bm25({SEARCH_TABLE}) AS rank FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s LIMIT -1 OFFSET 0) AS ranks '
+            f'WHERE ranks.id = {table}.id',
+            (fts_query,), output_field=models.FloatField()
+        )).order_by('-search_rank', '-pub_date')
+    condition = Q()
+    for word in normalize_document(query).split():
+        condition &= Q(search_document__icontains=word)
+    return queryset.filter(condition)
@@ -0,0 +1,27 @@
+"""Настройки для тестов: SQLite в памяти, кеш процесса и таблицы моделей
+без миграций, которые в репозитории не хранятся.
+
+Запуск: python manage.py test --settings=tests.settings
+"""
+import tempfile
+
+from foodgram.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+MIGRATION_MODULES = {'users': None, 'recipes': None}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram-tests',
+    }
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-tests-')
+IMAGE_VARIANTS_WORKERS = 0
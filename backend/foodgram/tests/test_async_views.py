@@ -0,0 +1,71 @@
+import importlib
+import os
+import sys
+from unittest import mock
+
+from api.views import RecipeViewSet
+from django.core.exceptions import ImproperlyConfigured
+from django.test import (AsyncRequestFactory, SimpleTestCase,
+                         TransactionTestCase, override_settings)
+from recipes.models import ShoppingCart
+from rest_framework.authtoken.models import Token
+from tests.utils import make_catalogue, make_recipe, make_user
+
+
+class AsyncDownloadTest(TransactionTestCase):
+    """Список покупок под ASGI: запросы к БД выполняются в пуле потоков,
+    а тело ответа формируется в цикле событий без обращения к БД."""
+
+    def setUp(self):
+        tags, ingredients = make_catalogue()
+        user = make_user('buyer')
+        self.token = Token.objects.create(user=user).key
+        for number in range(2):
+            recipe = make_recipe(user, f'Рецепт {number}', tags[:1],
+                                 ingredients[:3])
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    @override_settings(ASYNC_VIEWS=True)
+    async def download(self, format):
+        view = RecipeViewSet.as_view(
+            {'get': 'download_shopping_cart'},
+            **RecipeViewSet.download_shopping_cart.kwargs
+        )
+        request = AsyncRequestFactory().get(
+            f'/api/recipes/download_shopping_cart/?format={format}',
+            authorization=f'Token {self.token}'
+        )
+        response = await view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        # Обращение к БД здесь вызвало бы SynchronousOnlyOperation.
+        return b''.join(response.streaming_content)
+
+    async def test_text(self):
+        content = (await self.download('txt')).decode()
+        self.assertIn('абрикос, 20 г\n', content)
+        self.assertIn('яблоко, 20 шт\n', content)
+
+    async def test_pdf(self):
+        content = await self.download('pdf')
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+
+
+@mock.patch.dict(os.environ)
+@mock.patch.dict(sys.modules)
+class EntryPointTest(SimpleTestCase):
+    """Режим сервера задают точки входа."""
+
+    def import_entrypoint(self, name):
+        sys.modules.pop(name, None)
+        with self.assertRaises(ImproperlyConfigured):
+            importlib.import_module(name)
+
+    def test_asgi_requires_async_settings(self):
+        self.import_entrypoint('foodgram.asgi')
+        self.assertEqual(os.environ['SERVER_MODE'], 'asgi')
+
+    @override_settings(ASYNC_VIEWS=True, SERVER_MODE='asgi')
+    def test_wsgi_rejects_async_settings(self):
+        self.import_entrypoint('foodgram.wsgi')
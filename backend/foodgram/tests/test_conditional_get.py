@@ -0,0 +1,71 @@
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+from users.models import Subscription
+
+
+class ConditionalGetTest(CacheTestCase):
+    """Ответ 304 по ETag и Last-Modified до сериализации ответа."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, ingredients = make_catalogue()
+        cls.author = make_user('author')
+        cls.reader = make_user('reader')
+        cls.recipe = make_recipe(cls.author, 'Рецепт', cls.tags[:1],
+                                 ingredients[:2])
+        cls.url = f'/api/recipes/{cls.recipe.id}/'
+
+    def setUp(self):
+        super().setUp()
+        self.client = get_client(self.reader)
+
+    def get_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        return response['ETag']
+
+    def assert_not_modified(self, etag):
+        # Токен и версия рецепта.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_not_modified(self):
+        self.assert_not_modified(self.get_etag())
+
+    def test_subscription_changes_etag(self):
+        etag = self.get_etag()
+        Subscription.objects.create(user=self.reader, author=self.author)
+        self.assertNotEqual(self.get_etag(), etag)
+
+    def test_author_profile_changes_etag(self):
+        etag = self.get_etag()
+        self.author.first_name = 'Другое'
+        self.author.save()
+        self.assertNotEqual(self.get_etag(), etag)
+
+    def test_tag_change_changes_etag(self):
+        etag = self.get_etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tags[0].name = 'Завтрак'
+            self.tags[0].save()
+        self.assertNotEqual(self.get_etag(), etag)
+
+    def test_favorite_changes_etag(self):
+        etag = self.get_etag()
+        self.client.post(f'{self.url}favorite/')
+        new_etag = self.get_etag()
+        self.assertNotEqual(new_etag, etag)
+        self.assert_not_modified(new_etag)
+
+    def test_reference_data_if_modified_since(self):
+        response = get_client().get('/api/tags/')
+        self.assertIn('public', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = get_client().get(
+                '/api/tags/',
+                HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from api.db_router import ReplicaPool
+from api.views import RecipeViewSet
+from rest_framework.test import APIRequestFactory, force_authenticate
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+@mock.patch('api.db_router.replica_pool',
+            ReplicaPool(('replica',), 'round-robin'))
+class ReplicaRoutingTest(CacheTestCase):
+    """Выбор БД для чтения после изменений рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        cls.author = make_user('author')
+        cls.reader = make_user('reader')
+        cls.other = make_user('other')
+        cls.recipe = make_recipe(cls.author, 'Рецепт', tags[:1],
+                                 ingredients[:1])
+
+    def get_read_database(self, user=None):
+        request = APIRequestFactory().get('/api/recipes/')
+        if user is not None:
+            force_authenticate(request, user)
+        view = RecipeViewSet(action_map={'get': 'list'})
+        view.request = view.initialize_request(request)
+        return view.get_read_database(view.request)
+
+    def test_counter_write_sticks_only_writer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = get_client(self.reader).post(
+                f'/api/recipes/{self.recipe.id}/favorite/'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(self.get_read_database(self.reader))
+        self.assertEqual(self.get_read_database(self.other), 'replica')
+        self.assertEqual(self.get_read_database(), 'replica')
+
+    def test_content_change_reads_primary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = get_client(self.author).patch(
+                f'/api/recipes/{self.recipe.id}/', {'name': 'Новое'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.get_read_database(self.other))
+        self.assertIsNone(self.get_read_database())
@@ -0,0 +1,99 @@
+from api.feed import get_high_follower_authors
+from django.core.cache import cache
+from django.test import override_settings
+from recipes.models import FeedItem, Recipe
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+class FeedTest(CacheTestCase):
+    """Лента сливает разосланные рецепты с рецептами авторов, у которых
+    подписчиков больше FEED_FANOUT_MAX_FOLLOWERS."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_catalogue()
+        cls.reader = make_user('reader')
+        cls.other_reader = make_user('other')
+        cls.author = make_user('author')
+        cls.popular = make_user('popular')
+        cls.stranger = make_user('stranger')
+
+    def subscribe(self, user, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = get_client(user).post(
+                f'/api/users/{author.id}/subscribe/'
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def publish(self, author, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_recipe(author, name)
+
+    def walk(self, url):
+        client = get_client(self.reader)
+        ids = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_feed_merges_fan_out_and_popular_authors(self):
+        self.publish(self.author, 'До подписки')
+        self.subscribe(self.reader, self.author)
+        self.subscribe(self.reader, self.popular)
+        self.subscribe(self.other_reader, self.popular)
+        for number in range(3):
+            self.publish(self.author, f'Автор {number}')
+            self.publish(self.popular, f'Популярный {number}')
+            self.publish(self.stranger, f'Чужой {number}')
+
+        self.assertFalse(FeedItem.objects.filter(author=self.popular).exists())
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader, author=self.author)
+            .count(), 4
+        )
+        expected = list(Recipe.objects.filter(
+            author__in=(self.author, self.popular)
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk('/api/users/feed/?limit=3'), expected)
+
+    def test_unsubscribe_removes_recipes(self):
+        self.subscribe(self.reader, self.author)
+        self.publish(self.author, 'Рецепт')
+        with self.captureOnCommitCallbacks(execute=True):
+            get_client(self.reader).delete(
+                f'/api/users/{self.author.id}/subscribe/'
+            )
+        self.assertEqual(self.walk('/api/users/feed/'), [])
+
+    def test_author_below_threshold_is_backfilled(self):
+        self.subscribe(self.reader, self.popular)
+        self.subscribe(self.other_reader, self.popular)
+        recipe = self.publish(self.popular, 'Рецепт')
+        with self.captureOnCommitCallbacks(execute=True):
+            get_client(self.other_reader).delete(
+                f'/api/users/{self.popular.id}/subscribe/'
+            )
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, recipe=recipe
+        ).exists())
+        self.assertEqual(self.walk('/api/users/feed/'), [recipe.id])
+
+    def test_high_follower_flags_are_kept_per_author(self):
+        for author in (self.author, self.popular):
+            self.subscribe(self.reader, author)
+            self.subscribe(self.other_reader, author)
+        authors = {self.author.id, self.popular.id, self.stranger.id}
+        self.assertEqual(get_high_follower_authors(authors),
+                         {self.author.id, self.popular.id})
+        # После вытеснения из кеша признаки вычисляются по подпискам.
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_high_follower_authors(authors),
+                             {self.author.id, self.popular.id})
+        with self.assertNumQueries(0):
+            get_high_follower_authors(authors)
@@ -0,0 +1,97 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, F
+from recipes.management.commands.generate_scale_data import PASSWORD
+from recipes.models import (Favorite, FeedItem, Recipe, RecipeIngredients,
+                            ShoppingCart)
+from recipes.search import search_recipes
+from tests.utils import CacheTestCase, get_client
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def generate(*args):
+    output = io.StringIO()
+    call_command('generate_scale_data', '--users', '30', '--recipes', '60',
+                 '--favorites', '200', '--shopping-carts', '50',
+                 '--subscriptions', '80', '--batch-size', '25', *args,
+                 stdout=output)
+    return output.getvalue()
+
+
+class GenerateScaleDataTest(CacheTestCase):
+    """Генерация нагрузочного набора данных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.output = generate('--seed', '1')
+
+    def test_row_counts(self):
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Recipe.objects.count(), 60)
+        self.assertEqual(Favorite.objects.count(), 200)
+        self.assertEqual(ShoppingCart.objects.count(), 50)
+        self.assertEqual(Subscription.objects.count(), 80)
+        self.assertFalse(Subscription.objects.filter(
+            user=F('author')
+        ).exists())
+        # Повторно выбранный ингредиент рецепта записывается один раз,
+        # поэтому нижняя граница диапазона не гарантируется.
+        sizes = RecipeIngredients.objects.order_by().values(
+            'recipe'
+        ).annotate(total=Count('id')).values_list('total', flat=True)
+        self.assertEqual(len(sizes), 60)
+        self.assertTrue(all(1 <= size <= 12 for size in sizes))
+        self.assertIn('Создано строк:', self.output)
+
+    def test_counters_match_rows(self):
+        for field, model in (('favorites_count', Favorite),
+                             ('shopping_cart_count', ShoppingCart)):
+            counts = dict(model.objects.order_by().values(
+                'recipe'
+            ).annotate(total=Count('id')).values_list('recipe', 'total'))
+            for recipe_id, value in Recipe.objects.values_list('id', field):
+                self.assertEqual(value, counts.get(recipe_id, 0))
+
+    def test_feed_matches_subscriptions(self):
+        self.assertTrue(FeedItem.objects.exists())
+        self.assertFalse(FeedItem.objects.exclude(
+            recipe__author=F('author')
+        ).exists())
+        subscriptions = set(Subscription.objects.values_list('user',
+                                                             'author'))
+        self.assertTrue(set(FeedItem.objects.values_list(
+            'user', 'author'
+        )) <= subscriptions)
+
+    def test_generated_data_is_usable(self):
+        user = User.objects.first()
+        self.assertTrue(user.check_password(PASSWORD))
+        recipe = Recipe.objects.first()
+        word = recipe.name.split()[0]
+        self.assertIn(recipe, search_recipes(Recipe.objects.all(), word))
+        response = get_client(user).get('/api/recipes/')
+        self.assertEqual(response.data['count'], 60)
+
+    def test_ids_continue_after_existing_rows(self):
+        last_recipe = Recipe.objects.latest('id').id
+        generate()
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Recipe.objects.filter(id__gt=last_recipe).count(),
+                         60)
+        # После сброса последовательностей новые записи получают новые id.
+        self.assertGreater(User.objects.create(username='new').id,
+                           User.objects.exclude(username='new').latest(
+                               'id').id)
+
+    def test_invalid_options(self):
+        for args in (('--users', '1'), ('--batch-size', '0'),
+                     ('--ingredients-per-recipe', '5', '2'),
+                     ('--skew', '0')):
+            with self.subTest(args=args):
+                with self.assertRaises(CommandError):
+                    generate(*args)
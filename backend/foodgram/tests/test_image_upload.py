@@ -0,0 +1,90 @@
+import base64
+import json
+from unittest import mock
+
+from django.test import override_settings
+from recipes.models import Recipe
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_image, make_user)
+
+
+def data_uri(content, content_type='image/jpeg', line_length=None):
+    encoded = base64.b64encode(content).decode()
+    if line_length:
+        encoded = '\r\n'.join(
+            encoded[start:start + line_length]
+            for start in range(0, len(encoded), line_length)
+        )
+    return f'data:{content_type};base64,{encoded}'
+
+
+class ImageUploadTest(CacheTestCase):
+    """Изображение рецепта из data URI в base64 или из multipart."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = make_catalogue()
+        cls.author = make_user('author')
+
+    def post(self, image):
+        return get_client(self.author).post('/api/recipes/', {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5,
+            'image': image, 'tags': [self.tags[0].id],
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+        }, format='json')
+
+    def assert_image_error(self, response):
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_base64_image(self):
+        content = make_image().read()
+        response = self.post(data_uri(content))
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.image.read(), content)
+
+    @mock.patch('api.serializers.BASE64_CHUNK_SIZE', 10)
+    def test_base64_wrapped_across_lines(self):
+        # Переводы строк попадают на границы частей декодирования.
+        content = make_image().read()
+        response = self.post(data_uri(content, line_length=76))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Recipe.objects.get().image.read(), content)
+
+    def test_invalid_base64(self):
+        self.assert_image_error(self.post('data:image/jpeg;base64,/9j/4A*'))
+        self.assert_image_error(self.post('data:image/jpeg;base64,/9j/4A'))
+        self.assert_image_error(self.post('data:image/jpeg,/9j/4AAQ'))
+
+    def test_signature_must_match_type(self):
+        content = make_image().read()
+        self.assert_image_error(self.post(data_uri(content, 'image/png')))
+        self.assert_image_error(self.post(data_uri(b'not an image at all')))
+        self.assert_image_error(self.post(data_uri(content, 'image/svg+xml')))
+
+    def test_size_limit(self):
+        content = make_image().read()
+        with override_settings(RECIPE_IMAGE_MAX_SIZE=len(content) - 1):
+            self.assert_image_error(self.post(data_uri(content)))
+            response = get_client(self.author).post('/api/recipes/', {
+                'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5,
+                'image': make_image(), 'tags': [self.tags[0].id],
+                'ingredients': json.dumps(
+                    [{'id': self.ingredients[0].id, 'amount': 1}]
+                ),
+            }, format='multipart')
+            self.assert_image_error(response)
+
+    def test_multipart_upload(self):
+        response = get_client(self.author).post('/api/recipes/', {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5,
+            'image': make_image(), 'tags': [self.tags[0].id],
+            'ingredients': json.dumps(
+                [{'id': self.ingredients[0].id, 'amount': 1}]
+            ),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Recipe.objects.get().ingredients.get(),
+                         self.ingredients[0])
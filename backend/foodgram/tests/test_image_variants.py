@@ -0,0 +1,96 @@
+import io
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+from recipes.images import (IMAGE_FORMATS, IMAGE_VARIANTS,
+                            build_image_variants)
+from recipes.models import Recipe
+from sorl.thumbnail import get_thumbnail
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_user)
+
+
+def make_large_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 900), 'green').save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name='large.jpg')
+
+
+class ImageVariantsTest(CacheTestCase):
+    """Уменьшенные копии изображения создаются после фиксации рецепта,
+    а ссылки на них берутся из поля рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = make_catalogue()
+        cls.author = make_user('author')
+
+    def create_recipe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.author, name='Рецепт', text='Описание',
+                cooking_time=10, image=make_large_image()
+            )
+        recipe.tags.set(self.tags[:1])
+        recipe.refresh_from_db()
+        return recipe
+
+    def test_variants_built_after_commit(self):
+        recipe = self.create_recipe()
+        variants = recipe.image_variants
+        self.assertEqual(variants['source'], recipe.image.name)
+        for variant, geometry in IMAGE_VARIANTS.items():
+            self.assertEqual(variants[variant]['width'],
+                             int(geometry.split('x')[0]))
+            for extension, image_format in IMAGE_FORMATS.items():
+                with default_storage.open(variants[variant][extension]) as (
+                    file
+                ):
+                    self.assertEqual(Image.open(file).format, image_format)
+
+    def test_serialized_urls(self):
+        recipe = self.create_recipe()
+        with self.assertNumQueries(3):
+            data = get_client().get(f'/api/recipes/{recipe.id}/').data
+        self.assertEqual(set(data['image_variants']), set(IMAGE_VARIANTS))
+        self.assertTrue(data['image_variants']['card']['webp'].startswith(
+            'http://testserver/media/'
+        ))
+        self.assertEqual(
+            data['image_srcset']['jpeg'].split(', ')[0],
+            f'{data["image_variants"]["preview"]["jpeg"]} 160w'
+        )
+
+    def test_empty_until_built(self):
+        with mock.patch('recipes.images.build_image_variants') as build:
+            recipe = self.create_recipe()
+        build.assert_called_once_with(recipe.pk)
+        data = get_client().get(f'/api/recipes/{recipe.id}/').data
+        self.assertEqual(data['image_variants'], {})
+        self.assertEqual(data['image_srcset'], {})
+        self.assertTrue(data['image'])
+
+    def test_unchanged_image_not_rebuilt(self):
+        recipe = self.create_recipe()
+        with mock.patch('recipes.images.build_image_variants') as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.name = 'Новое название'
+                recipe.save()
+        build.assert_not_called()
+
+    def test_replaced_image_keeps_newer_variants(self):
+        recipe = self.create_recipe()
+
+        def replace_image(*args, **kwargs):
+            # Изображение заменили, пока создавались копии старого.
+            Recipe.objects.filter(pk=recipe.pk).update(image='other.jpg')
+            return get_thumbnail(*args, **kwargs)
+
+        Recipe.objects.filter(pk=recipe.pk).update(image_variants={})
+        with mock.patch('recipes.images.get_thumbnail',
+                        side_effect=replace_image):
+            build_image_variants(recipe.pk)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
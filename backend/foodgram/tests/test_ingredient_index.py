@@ -0,0 +1,86 @@
+from api.search import IngredientIndex, ingredient_index
+from recipes.models import Ingredient
+from tests.utils import CacheTestCase, get_client
+
+
+class IngredientIndexTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name, unit in (('Молоко', 'мл'), ('Молоко сгущенное', 'г'),
+                           ('Кокосовое молоко', 'мл'), ('Мука', 'г'),
+                           ('Ёжевика', 'г'), ('Сахар', 'г')):
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+
+    def setUp(self):
+        super().setUp()
+        self.index = IngredientIndex()
+
+    def search(self, query):
+        return [entry['name'] for entry in self.index.search(query)]
+
+    def test_prefix_then_substring(self):
+        self.assertEqual(self.search('молоко'), [
+            'Молоко', 'Молоко сгущенное', 'Кокосовое молоко'
+        ])
+
+    def test_case_and_yo_are_normalized(self):
+        self.assertEqual(self.search('  ЕЖЕВ'), ['Ёжевика'])
+
+    def test_typos(self):
+        self.assertEqual(self.search('малоко'), [
+            'Молоко', 'Молоко сгущенное', 'Кокосовое молоко'
+        ])
+        self.assertEqual(self.search('мкуа'), [])
+
+    def test_empty_query_returns_all(self):
+        self.assertEqual(len(self.search('')), 6)
+
+    def test_rebuilt_after_invalidation(self):
+        self.assertEqual(self.search('соль'), [])
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.assertEqual(self.search('соль'), [])
+        self.index.invalidate()
+        self.assertEqual(self.search('соль'), ['Соль'])
+
+    def test_snapshot_is_not_changed_by_rebuild(self):
+        snapshot = self.index.refresh()
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.index.invalidate()
+        self.assertEqual(self.search('соль'), ['Соль'])
+        self.assertIsNot(self.index.refresh(), snapshot)
+        self.assertEqual(list(snapshot.search('соль')), [])
+        self.assertEqual(len(snapshot.names), 6)
+
+
+class IngredientApiTest(CacheTestCase):
+    """Автодополнение ингредиентов через API отвечает из индекса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.milk = Ingredient.objects.create(name='Молоко',
+                                             measurement_unit='мл')
+        Ingredient.objects.create(name='Мука', measurement_unit='г')
+
+    def setUp(self):
+        super().setUp()
+        ingredient_index.snapshot = None
+
+    def get(self, query):
+        response = get_client().get('/api/ingredients/', {'name': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_search_without_queries_after_build(self):
+        self.assertEqual(self.get('мол'), [{
+            'id': self.milk.id, 'name': 'Молоко', 'measurement_unit': 'мл'
+        }])
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.get('м')), 2)
+
+    def test_new_ingredient_after_commit(self):
+        self.assertEqual(self.get('соль'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.assertEqual([item['name'] for item in self.get('соль')],
+                         ['Соль'])
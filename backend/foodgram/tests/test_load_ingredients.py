@@ -0,0 +1,91 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from recipes.models import Ingredient
+from tests.utils import CacheTestCase, get_client
+
+
+class LoadIngredientsTest(CacheTestCase):
+    """Пакетная загрузка ингредиентов из CSV и JSON."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def load(self, path, *args):
+        output = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('load_ingredients', path, *args, stdout=output)
+        return output.getvalue()
+
+    def get_ingredients(self):
+        return list(Ingredient.objects.order_by('name', 'measurement_unit')
+                    .values_list('name', 'measurement_unit'))
+
+    def test_csv_in_batches(self):
+        path = self.write('ingredients.csv', 'мука,г\n молоко , мл\n\n'
+                                             'молоко,г\nсахар\nмука,г\n')
+        output = self.load(path, '--batch-size', '2')
+        self.assertEqual(self.get_ingredients(), [
+            ('молоко', 'г'), ('молоко', 'мл'), ('мука', 'г')
+        ])
+        self.assertIn('Обработано строк: 4, добавлено: 3, '
+                      'пропущено существующих: 1.', output)
+
+    def test_existing_ingredients_are_kept(self):
+        flour = Ingredient.objects.create(name='мука', measurement_unit='г')
+        path = self.write('ingredients.csv', 'мука,г\nмука,кг\n')
+        self.load(path)
+        self.assertEqual(Ingredient.objects.get(
+            name='мука', measurement_unit='г'
+        ).pk, flour.pk)
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    @mock.patch('recipes.management.commands.load_ingredients.'
+                'JSON_CHUNK_SIZE', 16)
+    def test_json_read_in_chunks(self):
+        path = self.write('data.json', json.dumps([
+            {'name': 'абрикос', 'measurement_unit': 'г'},
+            {'model': 'recipes.ingredient', 'pk': 7,
+             'fields': {'name': 'яблоко', 'measurement_unit': 'шт'}},
+        ], ensure_ascii=False, indent=2))
+        self.load(path)
+        self.assertEqual(self.get_ingredients(), [
+            ('абрикос', 'г'), ('яблоко', 'шт')
+        ])
+
+    def test_format_option_and_errors(self):
+        path = self.write('ingredients.txt', '[{"name": "соль", '
+                                             '"measurement_unit": "г"}]')
+        with self.assertRaisesMessage(CommandError, 'Неизвестный формат'):
+            self.load(path)
+        self.load(path, '--format', 'json')
+        self.assertEqual(self.get_ingredients(), [('соль', 'г')])
+        broken = self.write('broken.json', '[{"name": "соль"')
+        with self.assertRaisesMessage(CommandError, 'Некорректный JSON'):
+            self.load(broken)
+        with self.assertRaisesMessage(CommandError, 'Ожидается JSON-массив'):
+            self.load(self.write('object.json', '{}'))
+
+    def test_search_index_invalidated(self):
+        client = get_client()
+        self.assertEqual(client.get('/api/ingredients/?name=соль').data, [])
+        self.load(self.write('ingredients.csv', 'соль,г\n'))
+        self.assertEqual(
+            [item['name'] for item in
+             client.get('/api/ingredients/?name=соль').data],
+            ['соль']
+        )
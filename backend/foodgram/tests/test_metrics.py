@@ -0,0 +1,86 @@
+from api.metrics import METRICS_WORKER_KEY, MetricsRegistry
+from django.core.cache import cache
+from django.test import override_settings
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+def make_registry(worker):
+    registry = MetricsRegistry()
+    registry.worker = worker
+    return registry
+
+
+def record(registry):
+    registry.record('recipes-list', 'GET', 200, 0.02, 0.01, 3, 0.004, 0.001)
+
+
+class RequestMetricsTest(CacheTestCase):
+    """Время БД, сериализации и рендеринга каждого запроса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        cls.admin = make_user('admin')
+        cls.admin.is_staff = True
+        cls.admin.save()
+        for number in range(3):
+            make_recipe(cls.admin, f'Рецепт {number}', tags, ingredients)
+
+    def test_server_timing(self):
+        response = get_client().get('/api/recipes/')
+        timings = {
+            item.split(';')[0]: item
+            for item in response['Server-Timing'].split(', ')
+        }
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'total'})
+        self.assertIn('desc="4 queries"', timings['db'])
+        self.assertNotEqual(timings['serialize'], 'serialize;dur=0.00')
+
+    def test_serialize_histogram_exported(self):
+        get_client().get('/api/recipes/')
+        response = get_client(self.admin).get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'foodgram_request_serialize_duration_seconds_count'
+            '{view="recipes-list",method="GET"}',
+            response.content.decode()
+        )
+
+
+class MetricsRegistryTest(CacheTestCase):
+    """Снимки процессов хранятся в отдельных слотах кеша."""
+
+    def test_workers_take_separate_slots(self):
+        first, second = make_registry('a:1'), make_registry('b:2')
+        record(first)
+        record(second)
+        first.flush()
+        second.flush()
+        self.assertEqual((first.slot, second.slot), (0, 1))
+        histograms, counters = first.collect()
+        self.assertEqual(sum(counters.values()), 2)
+        self.assertEqual(histograms[(
+            'foodgram_request_db_queries',
+            (('view', 'recipes-list'), ('method', 'GET'))
+        )][-1], 6)
+
+    def test_expired_slot_is_claimed_again(self):
+        first, second = make_registry('a:1'), make_registry('b:2')
+        first.flush()
+        # Слот первого процесса истек и достался второму.
+        cache.delete(METRICS_WORKER_KEY.format(0))
+        second.flush()
+        record(first)
+        first.flush()
+        self.assertEqual((first.slot, second.slot), (1, 0))
+        self.assertEqual(sum(first.collect()[1].values()), 1)
+
+    @override_settings(METRICS_MAX_WORKERS=1)
+    def test_no_free_slots(self):
+        first, second = make_registry('a:1'), make_registry('b:2')
+        record(second)
+        first.flush()
+        second.flush()
+        self.assertIsNone(second.slot)
+        self.assertEqual(first.collect()[1], {})
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from recipes.models import Recipe
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+class KeysetPaginationTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        cls.author = make_user('author')
+        recipes = [
+            make_recipe(cls.author, f'Рецепт {number}', tags[:1],
+                        ingredients[:1])
+            for number in range(7)
+        ]
+        # Одинаковое время публикации у нескольких рецептов: порядок
+        # внутри группы определяется id.
+        published = timezone.now() - timedelta(days=1)
+        for number, recipe in enumerate(recipes):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=published - timedelta(hours=number // 3)
+            )
+        cls.expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+
+    def walk(self, client, url):
+        ids = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_follow_order_without_gaps(self):
+        ids = self.walk(get_client(), '/api/recipes/?cursor=&limit=2')
+        self.assertEqual(ids, self.expected)
+
+    def test_new_recipe_does_not_shift_pages(self):
+        client = get_client()
+        response = client.get('/api/recipes/?cursor=&limit=3')
+        first_page = [item['id'] for item in response.data['results']]
+        make_recipe(self.author, 'Новый рецепт')
+        rest = self.walk(client, response.data['next'])
+        self.assertEqual(first_page + rest, self.expected)
+
+    def test_invalid_cursor(self):
+        response = get_client().get('/api/recipes/?cursor=broken')
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_mode_is_default(self):
+        response = get_client().get('/api/recipes/?limit=2&page=2')
+        self.assertEqual(response.data['count'], len(self.expected))
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            self.expected[2:4]
+        )
@@ -0,0 +1,66 @@
+from api.pantry import (PANTRY_INDEX_CHANGE_KEY, PantryIndex,
+                        mark_recipes_changed)
+from django.core.cache import cache
+from recipes.models import Ingredient, RecipeIngredients
+from tests.utils import CacheTestCase, make_recipe, make_user
+
+
+class PantryIndexTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(5)
+        ]
+        first, second, third, fourth, _ = cls.ingredients
+        author = make_user('author')
+        cls.full = make_recipe(author, 'Все есть', (), (first, second))
+        cls.half = make_recipe(author, 'Половина', (), (first, third))
+        cls.third = make_recipe(author, 'Треть', (), (first, third, fourth))
+
+    def setUp(self):
+        super().setUp()
+        self.index = PantryIndex()
+
+    def ids(self, ingredients):
+        return frozenset(ingredient.id for ingredient in ingredients)
+
+    def test_rank_by_coverage(self):
+        first, second = self.ingredients[:2]
+        ranked = self.index.rank(self.ids((first, second)))
+        self.assertEqual(ranked, [
+            (self.full.id, 1.0, 2),
+            (self.half.id, 0.5, 1),
+            (self.third.id, 1 / 3, 1),
+        ])
+        self.assertEqual(
+            self.index.get_missing(self.half.id, self.ids((first, second))),
+            {self.ingredients[2].id}
+        )
+
+    def test_unknown_ingredients(self):
+        self.assertEqual(self.index.rank(self.ids(self.ingredients[4:])), [])
+
+    def test_incremental_update_from_changelog(self):
+        self.index.refresh()
+        fifth = self.ingredients[4]
+        RecipeIngredients.objects.create(recipe=self.half, ingredient=fifth,
+                                         amount=1)
+        RecipeIngredients.objects.filter(recipe=self.third).delete()
+        mark_recipes_changed((self.half.id, self.third.id))
+        with self.assertNumQueries(1):
+            ranked = self.index.rank(self.ids((fifth,)))
+        self.assertEqual(ranked, [(self.half.id, 1 / 3, 1)])
+        self.assertNotIn(self.third.id, self.index.recipes)
+
+    def test_rebuilt_when_changelog_is_missing(self):
+        self.index.refresh()
+        fifth = self.ingredients[4]
+        RecipeIngredients.objects.create(recipe=self.full, ingredient=fifth,
+                                         amount=1)
+        mark_recipes_changed((self.full.id,))
+        cache.delete(PANTRY_INDEX_CHANGE_KEY.format(self.index.version + 1))
+        self.assertEqual(self.index.rank(self.ids((fifth,))),
+                         [(self.full.id, 1 / 3, 1)])
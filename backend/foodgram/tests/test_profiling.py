@@ -0,0 +1,76 @@
+import os
+import pstats
+import tempfile
+
+from django.test import override_settings
+from recipes.models import ShoppingCart
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+class ProfilingTest(CacheTestCase):
+    """Профилирование запросов сотрудников по заголовку или параметру."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        cls.staff = make_user('staff')
+        cls.staff.is_staff = True
+        cls.staff.save()
+        cls.user = make_user('user')
+        recipe = make_recipe(cls.staff, 'Рецепт', tags[:1], ingredients[:2])
+        ShoppingCart.objects.create(user=cls.staff, recipe=recipe)
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PROFILING_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory.name
+
+    def assert_profiled(self, response, view):
+        name = response['X-Profile-Id']
+        self.assertIn(f'-get-{view}-', name)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         [f'{name}.collapsed', f'{name}.prof'])
+        stats = pstats.Stats(os.path.join(self.directory, f'{name}.prof'))
+        return {function for _, _, function in stats.stats}
+
+    def test_staff_header(self):
+        client = get_client(self.staff)
+        response = client.get('/api/recipes/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        functions = self.assert_profiled(response, 'recipes-list')
+        self.assertIn('list', functions)
+
+    def test_staff_query_parameter(self):
+        response = get_client(self.staff).get('/api/tags/?profile=1')
+        self.assert_profiled(response, 'tags-list')
+
+    def test_not_profiled(self):
+        for client in (get_client(self.user), get_client()):
+            response = client.get('/api/recipes/', HTTP_X_PROFILE='1')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profile-Id', response)
+        response = get_client(self.staff).get('/api/recipes/')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_requests(self):
+        response = get_client().get('/api/tags/')
+        self.assert_profiled(response, 'tags-list')
+
+    def test_streaming_response(self):
+        response = get_client(self.staff).get(
+            '/api/recipes/download_shopping_cart/?format=txt&profile=1'
+        )
+        # Файл сформирован под профилировщиком и отдается целиком.
+        functions = self.assert_profiled(
+            response, 'recipes-download-shopping-cart'
+        )
+        self.assertIn('stream', functions)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('абрикос, 10 г\n', content)
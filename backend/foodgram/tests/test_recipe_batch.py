@@ -0,0 +1,66 @@
+from recipes.models import Recipe
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_image_data_uri, make_recipe, make_user)
+
+
+class RecipeBatchTest(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = make_catalogue()
+        cls.author = make_user('author')
+
+    def get_recipe(self, name, **fields):
+        return {
+            'name': name, 'text': 'Описание', 'cooking_time': 5,
+            'image': make_image_data_uri(), 'tags': [self.tags[0].id],
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+            **fields,
+        }
+
+    def post(self, recipes, atomic):
+        return get_client(self.author).post(
+            '/api/recipes/batch/', {'atomic': atomic, 'recipes': recipes},
+            format='json'
+        )
+
+    def test_atomic_batch_rejects_all_on_error(self):
+        response = self.post([
+            self.get_recipe('Первый'),
+            self.get_recipe('Второй', tags=[0]),
+        ], atomic=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['errors']), {'1'})
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_non_atomic_batch_creates_valid_recipes(self):
+        response = self.post([
+            self.get_recipe('Первый'),
+            self.get_recipe('Второй', tags=[0]),
+            self.get_recipe('Первый'),
+            self.get_recipe('Третий', cooking_time=0),
+        ], atomic=False)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(set(response.data['errors']), {'1', '2', '3'})
+        self.assertEqual(
+            [recipe['name'] for recipe in response.data['created']],
+            ['Первый']
+        )
+        recipe = Recipe.objects.get()
+        self.assertEqual(list(recipe.tags.all()), [self.tags[0]])
+        self.assertEqual(recipe.recipe_ingredients.get().amount, 1)
+
+    def test_batch_without_errors(self):
+        response = self.post([
+            self.get_recipe('Первый'), self.get_recipe('Второй')
+        ], atomic=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['errors'], {})
+        self.assertEqual(Recipe.objects.filter(author=self.author).count(),
+                         2)
+
+    def test_existing_name_is_rejected(self):
+        make_recipe(self.author, 'Первый')
+        response = self.post([self.get_recipe('Первый')], atomic=False)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Recipe.objects.count(), 1)
@@ -0,0 +1,76 @@
+from api.cache import RECIPES_GENERATION_KEY, get_generation
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+class AnonymousRecipeCacheTest(CacheTestCase):
+    """Кеш ответов для анонимных пользователей и его сброс."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, ingredients = make_catalogue()
+        cls.author = make_user('author')
+        cls.reader = make_user('reader')
+        cls.recipe = make_recipe(cls.author, 'Рецепт', cls.tags[:1],
+                                 ingredients[:2])
+
+    def get(self, url, cache_status, **headers):
+        response = get_client().get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], cache_status)
+        return response
+
+    def test_recipe_change_invalidates_cache(self):
+        self.get('/api/recipes/', 'MISS')
+        self.get('/api/recipes/', 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = get_client(self.author).patch(
+                f'/api/recipes/{self.recipe.id}/',
+                {'name': 'Новое название'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        response = self.get('/api/recipes/', 'MISS')
+        self.assertEqual(response.data['results'][0]['name'],
+                         'Новое название')
+
+    def test_tag_change_invalidates_cache(self):
+        self.get(f'/api/recipes/{self.recipe.id}/', 'MISS')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tags[0].name = 'Завтрак'
+            self.tags[0].save()
+        response = self.get(f'/api/recipes/{self.recipe.id}/', 'MISS')
+        self.assertEqual(response.data['tags'][0]['name'], 'Завтрак')
+
+    def test_counters_do_not_invalidate_cache(self):
+        self.get('/api/recipes/', 'MISS')
+        generation = get_generation(RECIPES_GENERATION_KEY)
+        client = get_client(self.reader)
+        url = f'/api/recipes/{self.recipe.id}/'
+        for method, path, count in (
+            ('post', 'favorite', 1), ('post', 'shopping_cart', 1),
+            ('delete', 'favorite', 0),
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(client, method)(f'{url}{path}/')
+            self.assertIn(response.status_code, (201, 204))
+            with self.assertNumQueries(0):
+                response = self.get('/api/recipes/', 'HIT')
+            self.assertEqual(
+                response.data['results'][0]['favorites_count'], count
+            )
+        self.assertEqual(response.data['results'][0]['shopping_cart_count'],
+                         1)
+        self.assertEqual(get_generation(RECIPES_GENERATION_KEY), generation)
+
+    def test_detail_etag_follows_counters(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        self.get(url, 'MISS')
+        etag = self.get(url, 'HIT')['ETag']
+        with self.assertNumQueries(0):
+            response = get_client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            get_client(self.reader).post(f'{url}favorite/')
+        response = self.get(url, 'HIT', HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['favorites_count'], 1)
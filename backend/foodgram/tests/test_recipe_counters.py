@@ -0,0 +1,74 @@
+import io
+
+from api.counters import get_cached_recipe_counters
+from django.core.management import call_command
+from recipes.models import Favorite, Recipe, ShoppingCart
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+class RecipeCountersTest(CacheTestCase):
+    """Счетчики избранного и списков покупок хранятся в рецепте."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        cls.author = make_user('author')
+        cls.users = [make_user(f'user{number}') for number in range(2)]
+        cls.recipe = make_recipe(cls.author, 'Рецепт', tags[:1],
+                                 ingredients[:1])
+
+    def get_counters(self):
+        return Recipe.objects.filter(pk=self.recipe.pk).values_list(
+            'favorites_count', 'shopping_cart_count'
+        ).get()
+
+    def toggle(self, user, method, action, expected_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(get_client(user), method)(
+                f'/api/recipes/{self.recipe.id}/{action}/'
+            )
+        self.assertEqual(response.status_code, expected_status)
+
+    def test_add_and_remove(self):
+        for user in self.users:
+            self.toggle(user, 'post', 'favorite', 201)
+        self.toggle(self.users[0], 'post', 'shopping_cart', 201)
+        # Повторное добавление отклоняется и не меняет счетчик.
+        self.toggle(self.users[0], 'post', 'favorite', 400)
+        self.assertEqual(self.get_counters(), (2, 1))
+        self.assertEqual(get_cached_recipe_counters(self.recipe.id), {
+            'favorites_count': 2, 'shopping_cart_count': 1
+        })
+
+        self.toggle(self.users[0], 'delete', 'favorite', 204)
+        self.toggle(self.users[0], 'delete', 'shopping_cart', 204)
+        self.toggle(self.users[0], 'delete', 'shopping_cart', 404)
+        self.assertEqual(self.get_counters(), (1, 0))
+        response = get_client().get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.data['favorites_count'], 1)
+        self.assertEqual(response.data['shopping_cart_count'], 0)
+
+    def test_counter_not_negative(self):
+        Favorite.objects.create(user=self.users[0], recipe=self.recipe)
+        self.toggle(self.users[0], 'delete', 'favorite', 204)
+        self.assertEqual(self.get_counters(), (0, 0))
+
+    def test_reconcile_after_cascade_delete(self):
+        for user in self.users:
+            self.toggle(user, 'post', 'favorite', 201)
+            self.toggle(user, 'post', 'shopping_cart', 201)
+        # Удаление пользователя каскадно удаляет его избранное и корзину
+        # в обход счетчиков.
+        self.users[0].delete()
+        ShoppingCart.objects.create(user=self.author, recipe=self.recipe)
+        self.assertEqual(self.get_counters(), (2, 2))
+
+        output = io.StringIO()
+        call_command('reconcile_counters', '--batch-size', '1',
+                     stdout=output)
+        self.assertIn('исправлено: 1', output.getvalue())
+        self.assertEqual(self.get_counters(), (1, 2))
+        self.assertEqual(get_cached_recipe_counters(self.recipe.id), {
+            'favorites_count': 1, 'shopping_cart_count': 2
+        })
@@ -0,0 +1,96 @@
+from recipes.models import Favorite, ShoppingCart, SimilarRecipe
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+from users.models import Subscription
+
+
+class RecipeQueriesTest(CacheTestCase):
+    """Число SQL-запросов списка и страницы рецепта не зависит от числа
+    рецептов, тегов и ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        cls.user = make_user('reader')
+        cls.authors = [make_user(f'author{number}') for number in range(3)]
+        cls.recipes = [
+            make_recipe(cls.authors[number % 3], f'Рецепт {number}',
+                        tags[:number % 3 + 1], ingredients[:number % 5 + 1])
+            for number in range(12)
+        ]
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=cls.authors[0])
+
+    def get(self, client, url, queries):
+        with self.assertNumQueries(queries):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous_list(self):
+        # COUNT, рецепты с авторами, теги, ингредиенты.
+        for limit in (3, 10):
+            response = self.get(get_client(), f'/api/recipes/?limit={limit}',
+                                4)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_list_from_cache(self):
+        self.get(get_client(), '/api/recipes/', 4)
+        response = self.get(get_client(), '/api/recipes/', 0)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_authenticated_list(self):
+        # Токен и те же четыре запроса: флаги вычисляются в запросе рецептов.
+        client = get_client(self.user)
+        for limit in (3, 10):
+            response = self.get(client, f'/api/recipes/?limit={limit}', 5)
+            self.assertEqual(len(response.data['results']), limit)
+        flags = {
+            item['id']: (item['is_favorited'], item['is_in_shopping_cart'],
+                         item['author']['is_subscribed'])
+            for item in response.data['results']
+        }
+        for number, recipe in enumerate(self.recipes):
+            if recipe.id in flags:
+                self.assertEqual(flags[recipe.id], (
+                    number % 2 == 0, number % 3 == 0,
+                    recipe.author == self.authors[0]
+                ))
+
+    def test_anonymous_detail(self):
+        recipe = self.recipes[4]
+        response = self.get(get_client(), f'/api/recipes/{recipe.id}/', 3)
+        self.assertEqual(len(response.data['tags']), 2)
+        self.assertEqual(len(response.data['ingredients']), 5)
+
+    def test_authenticated_detail(self):
+        # Токен, версия для ETag, рецепт, теги, ингредиенты.
+        recipe = self.recipes[0]
+        response = self.get(get_client(self.user),
+                            f'/api/recipes/{recipe.id}/', 5)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertTrue(response.data['is_in_shopping_cart'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+    def test_similar(self):
+        # Похожие рецепты; существование рецепта проверяется, только если
+        # похожих нет: бюджет recipe_similar рассчитан на этот случай.
+        recipe = self.recipes[0]
+        SimilarRecipe.objects.create(recipe=recipe, similar=self.recipes[1],
+                                     score=1)
+        SimilarRecipe.objects.create(recipe=recipe, similar=self.recipes[2],
+                                     score=2)
+        response = self.get(get_client(), f'/api/recipes/{recipe.id}/similar/',
+                            1)
+        self.assertEqual([item['id'] for item in response.data],
+                         [self.recipes[2].id, self.recipes[1].id])
+        response = self.get(
+            get_client(), f'/api/recipes/{self.recipes[3].id}/similar/', 2
+        )
+        self.assertEqual(response.data, [])
+        for pk in (0, 'abc'):
+            response = get_client().get(f'/api/recipes/{pk}/similar/')
+            self.assertEqual(response.status_code, 404)
@@ -0,0 +1,97 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe, RecipeIngredients, RecipeTags
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_image_data_uri, make_recipe, make_user)
+
+
+class RecipeUpdateTest(CacheTestCase):
+    """Теги и ингредиенты обновляются по разнице: неизменные строки
+    сохраняют первичные ключи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = make_catalogue()
+        cls.author = make_user('author')
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = make_recipe(self.author, 'Рецепт', self.tags[:2],
+                                  self.ingredients[:3])
+        self.client = get_client(self.author)
+
+    def get_rows(self, model, field):
+        return dict(model.objects.filter(recipe=self.recipe).values_list(
+            field, 'id'
+        ))
+
+    def test_ingredients_diff_keeps_primary_keys(self):
+        before = self.get_rows(RecipeIngredients, 'ingredient')
+        first, second, third, fourth = self.ingredients[:4]
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/', {'ingredients': [
+                {'id': first.id, 'amount': 10},
+                {'id': second.id, 'amount': 25},
+                {'id': fourth.id, 'amount': 5},
+            ]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        after = self.get_rows(RecipeIngredients, 'ingredient')
+        self.assertEqual(set(after), {first.id, second.id, fourth.id})
+        self.assertEqual(after[first.id], before[first.id])
+        self.assertEqual(after[second.id], before[second.id])
+        self.assertNotIn(third.id, after)
+        amounts = dict(RecipeIngredients.objects.filter(
+            recipe=self.recipe
+        ).values_list('ingredient', 'amount'))
+        self.assertEqual(amounts,
+                         {first.id: 10, second.id: 25, fourth.id: 5})
+
+    def test_unchanged_ingredients_are_not_written(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.id}/', {'ingredients': [
+                    {'id': ingredient.id, 'amount': 10}
+                    for ingredient in self.ingredients[:3]
+                ]}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        writes = [
+            query['sql'] for query in context.captured_queries
+            if RecipeIngredients._meta.db_table in query['sql']
+            and not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(writes, [])
+
+    def test_tags_diff_keeps_primary_keys(self):
+        before = self.get_rows(RecipeTags, 'tag')
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {'tags': [self.tags[1].id, self.tags[2].id]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        after = self.get_rows(RecipeTags, 'tag')
+        self.assertEqual(set(after), {self.tags[1].id, self.tags[2].id})
+        self.assertEqual(after[self.tags[1].id], before[self.tags[1].id])
+
+    def test_put_replaces_recipe(self):
+        response = self.client.put(f'/api/recipes/{self.recipe.id}/', {
+            'name': 'Новое название', 'text': 'Новое описание',
+            'cooking_time': 15, 'image': make_image_data_uri(),
+            'tags': [self.tags[2].id],
+            'ingredients': [{'id': self.ingredients[4].id, 'amount': 3}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Новое название')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.cooking_time, 15)
+        self.assertEqual(set(self.get_rows(RecipeTags, 'tag')),
+                         {self.tags[2].id})
+        self.assertEqual(set(self.get_rows(RecipeIngredients, 'ingredient')),
+                         {self.ingredients[4].id})
+
+    def test_put_requires_all_fields(self):
+        response = self.client.put(f'/api/recipes/{self.recipe.id}/',
+                                   {'name': 'Только название'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).name, 'Рецепт')
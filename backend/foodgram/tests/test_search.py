@@ -0,0 +1,85 @@
+import base64
+import json
+from urllib.parse import urlencode
+
+from recipes.models import Recipe
+from recipes.search import search_recipes, update_search_documents
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+class RecipeSearchTest(CacheTestCase):
+    """Полнотекстовый поиск рецептов с сортировкой по релевантности."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        author = make_user('author')
+        names = ('Шарлотка', 'Яблочный пирог',
+                 'Пирог с яблоком и яблочным джемом', 'Ёжики', 'Блины')
+        apricot, apple = ingredients[:2]
+        # Яблоко есть только в ингредиентах шарлотки.
+        cls.recipes = {
+            name: make_recipe(author, name, tags[:1],
+                              [apple if name == 'Шарлотка' else apricot])
+            for name in names
+        }
+        update_search_documents(
+            recipe.id for recipe in cls.recipes.values()
+        )
+
+    def search(self, query):
+        return [recipe.name for recipe in search_recipes(
+            Recipe.objects.all(), query
+        )]
+
+    def test_rank_and_prefix(self):
+        # Слово ищется по началу в названии, описании и ингредиентах.
+        recipes = list(search_recipes(Recipe.objects.all(), 'ябло'))
+        self.assertEqual({recipe.name for recipe in recipes}, {
+            'Пирог с яблоком и яблочным джемом', 'Яблочный пирог',
+            'Шарлотка'
+        })
+        ranks = [recipe.search_rank for recipe in recipes]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_all_words_required(self):
+        self.assertEqual(self.search('пирог джем'),
+                         ['Пирог с яблоком и яблочным джемом'])
+        self.assertEqual(self.search('пирог блины'), [])
+
+    def test_yo_and_quotes(self):
+        self.assertEqual(self.search('ежики'), ['Ёжики'])
+        self.assertEqual(self.search('"блины'), ['Блины'])
+
+    def test_empty_query(self):
+        self.assertEqual(len(self.search('  ')), len(self.recipes))
+
+    def walk(self, **params):
+        names = []
+        url = f'/api/recipes/?{urlencode(params)}'
+        while url:
+            response = get_client().get(url)
+            self.assertEqual(response.status_code, 200)
+            names.extend(item['name'] for item in response.data['results'])
+            url = response.data['next']
+        return names
+
+    def test_cursor_keeps_rank_order(self):
+        self.assertEqual(self.walk(search='ябло', cursor='', limit=1),
+                         self.search('ябло'))
+
+    def test_page_number_keeps_rank_order(self):
+        response = get_client().get('/api/recipes/',
+                                    {'search': 'ябло', 'limit': 2})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([item['name'] for item in response.data['results']],
+                         self.search('ябло')[:2])
+
+    def test_invalid_rank_in_cursor(self):
+        cursor = base64.urlsafe_b64encode(json.dumps(
+            ['abc', '2020-01-01T00:00:00+00:00', 1]
+        ).encode()).decode()
+        response = get_client().get('/api/recipes/',
+                                    {'search': 'ябло', 'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,90 @@
+import csv
+import io
+import re
+from unittest import mock
+
+from api import renderers
+from recipes.models import ShoppingCart
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+class ShoppingListDownloadTest(CacheTestCase):
+    """Список покупок под WSGI: один агрегирующий запрос и потоковая
+    выдача файла."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        cls.user = make_user('buyer')
+        for number in range(2):
+            recipe = make_recipe(cls.user, f'Рецепт {number}', tags[:1],
+                                 ingredients[:3])
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        # Рецепт не из списка покупок не попадает в файл.
+        make_recipe(cls.user, 'Рецепт 2', tags[:1], ingredients[3:])
+
+    def download(self, format):
+        client = get_client(self.user)
+        # Запрос токена и один запрос строк списка.
+        with self.assertNumQueries(2):
+            response = client.get(
+                f'/api/recipes/download_shopping_cart/?format={format}'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            self.assertEqual(
+                response['Content-Disposition'],
+                f'attachment; filename=shopping-list.{format}'
+            )
+            return b''.join(response.streaming_content)
+
+    def test_text(self):
+        content = self.download('txt').decode()
+        self.assertTrue(content.startswith(
+            'Список покупок для: Имя Фамилия\n\n'
+        ))
+        lines = content.splitlines()[-3:]
+        self.assertEqual(lines, ['абрикос, 20 г', 'молоко, 20 мл',
+                                 'яблоко, 20 шт'])
+        self.assertNotIn('мука', content)
+
+    def test_csv(self):
+        content = self.download('csv').decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows, [
+            ['Ингредиент', 'Количество', 'Единица измерения'],
+            ['абрикос', '20', 'г'],
+            ['молоко', '20', 'мл'],
+            ['яблоко', '20', 'шт'],
+        ])
+
+    def assert_pdf(self, content, pages):
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+        self.assertEqual(len(re.findall(rb'/Type /Page\b', content)), pages)
+        # Смещения объектов в таблице xref указывают на их начало.
+        xref = int(re.search(rb'startxref\n(\d+)', content).group(1))
+        self.assertTrue(content[xref:].startswith(b'xref'))
+        offsets = re.findall(rb'(\d{10}) 00000 n', content[xref:])
+        for number, offset in enumerate(offsets, start=1):
+            self.assertTrue(content[int(offset):].startswith(
+                b'%d 0 obj' % number
+            ))
+
+    def test_pdf(self):
+        content = self.download('pdf')
+        self.assert_pdf(content, pages=1)
+        self.assertIn('абрикос, 20 г'.encode(renderers.PDF_ENCODING),
+                      content)
+
+    @mock.patch('api.renderers.PDF_LINES_PER_PAGE', 2)
+    def test_pdf_pages(self):
+        content = self.download('pdf')
+        # Две строки заголовка, пустая строка и три ингредиента.
+        self.assert_pdf(content, pages=3)
+
+    def test_empty_list(self):
+        ShoppingCart.objects.all().delete()
+        content = self.download('txt').decode()
+        self.assertEqual(content.count('\n'), 4)
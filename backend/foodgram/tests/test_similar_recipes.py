@@ -0,0 +1,75 @@
+import io
+import math
+
+from django.core.management import call_command
+from recipes.models import Favorite, SimilarRecipe, SimilarRecipesBuild
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+
+
+class BuildSimilarRecipesTest(CacheTestCase):
+    """Расчет похожих рецептов по совместному избранному."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        author = make_user('author')
+        cls.recipes = [
+            make_recipe(author, f'Рецепт {number}', tags[:1], ingredients[:1])
+            for number in range(4)
+        ]
+        cls.users = [make_user(f'user{number}') for number in range(4)]
+        for user, recipes in zip(cls.users, ((0, 1, 2), (0, 1), (0, 2, 3),
+                                             (0, 1))):
+            for number in recipes:
+                cls.favorite(user, number)
+
+    @classmethod
+    def favorite(cls, user, number):
+        Favorite.objects.create(user=user, recipe=cls.recipes[number])
+
+    def build(self, *args):
+        output = io.StringIO()
+        call_command('build_similar_recipes', *args, stdout=output)
+        return output.getvalue()
+
+    def get_similar(self, number):
+        return {
+            similar_id: score
+            for similar_id, score in SimilarRecipe.objects.filter(
+                recipe=self.recipes[number]
+            ).order_by('-score').values_list('similar_id', 'score')
+        }
+
+    def test_full_build(self):
+        self.assertIn('полный', self.build())
+        recipes = self.recipes
+        # Общих пользователей у пары, деленное на корень произведения
+        # популярностей; пары с одним общим пользователем отбрасываются.
+        similar = self.get_similar(0)
+        self.assertEqual(list(similar), [recipes[1].id, recipes[2].id])
+        self.assertAlmostEqual(similar[recipes[1].id], 3 / math.sqrt(12),
+                               places=5)
+        self.assertAlmostEqual(similar[recipes[2].id], 2 / math.sqrt(8),
+                               places=5)
+        self.assertEqual(list(self.get_similar(1)), [recipes[0].id])
+        self.assertEqual(self.get_similar(3), {})
+
+        with self.assertNumQueries(1):
+            response = get_client().get(f'/api/recipes/{recipes[0].id}/'
+                                        f'similar/?limit=1')
+        self.assertEqual([item['id'] for item in response.data],
+                         [recipes[1].id])
+
+    def test_incremental_build(self):
+        self.build()
+        self.assertIn('Нового избранного нет', self.build())
+        self.favorite(self.users[1], 2)
+        self.assertIn('инкрементальный', self.build())
+        self.assertEqual(list(self.get_similar(1)),
+                         [self.recipes[0].id, self.recipes[2].id])
+        self.assertIn(self.recipes[1].id, self.get_similar(2))
+        self.assertEqual(
+            SimilarRecipesBuild.objects.values_list('full', flat=True)[0],
+            False
+        )
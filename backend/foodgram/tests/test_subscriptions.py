@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from recipes.models import Recipe
+from tests.utils import (CacheTestCase, get_client, make_catalogue,
+                         make_recipe, make_user)
+from users.models import Subscription
+
+
+class SubscriptionsTest(CacheTestCase):
+    """Подписки с превью рецептов, выбранными оконной функцией."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = make_catalogue()
+        cls.user = make_user('reader')
+        cls.authors = [make_user(f'author{number}') for number in range(4)]
+        now = timezone.now()
+        cls.recipes = {author.id: [] for author in cls.authors}
+        for number, author in enumerate(cls.authors):
+            for position in range(number + 1):
+                recipe = make_recipe(author, f'Рецепт {number}.{position}',
+                                     tags[:1], ingredients[:1])
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    pub_date=now - timedelta(days=position)
+                )
+                cls.recipes[author.id].append(recipe.id)
+        for author in cls.authors[1:]:
+            Subscription.objects.create(user=cls.user, author=author)
+
+    def get(self, url):
+        client = get_client(self.user)
+        # Токен, COUNT, авторы со счетчиками и превью рецептов.
+        with self.assertNumQueries(4):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_recipes_limit(self):
+        data = self.get('/api/users/subscriptions/?recipes_limit=2')
+        self.assertEqual([item['id'] for item in data['results']],
+                         [author.id for author in self.authors[1:]])
+        for item in data['results']:
+            recipes = self.recipes[item['id']]
+            self.assertEqual(item['recipes_count'], len(recipes))
+            self.assertTrue(item['is_subscribed'])
+            # Последние рецепты автора, от новых к старым.
+            self.assertEqual([recipe['id'] for recipe in item['recipes']],
+                             recipes[:2])
+
+    def test_without_limit(self):
+        data = self.get('/api/users/subscriptions/')
+        for item in data['results']:
+            self.assertEqual(
+                sorted(recipe['id'] for recipe in item['recipes']),
+                sorted(self.recipes[item['id']])
+            )
+
+    def test_queries_do_not_depend_on_page_size(self):
+        for limit in (1, 3):
+            data = self.get(
+                f'/api/users/subscriptions/?limit={limit}&recipes_limit=1'
+            )
+            self.assertEqual(len(data['results']), limit)
+
+    def test_limit_per_author(self):
+        recipes = Recipe.objects.filter(author__in=self.authors)
+        previews = {}
+        for recipe in recipes.limit_per_author(2):
+            previews.setdefault(recipe.author_id, []).append(recipe.id)
+        self.assertEqual(previews, {
+            author_id: recipe_ids[:2]
+            for author_id, recipe_ids in self.recipes.items()
+        })
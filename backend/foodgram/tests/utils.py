@@ -0,0 +1,76 @@
+import base64
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from PIL import Image
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name='recipe.jpg')
+
+
+def make_image_data_uri():
+    return 'data:image/jpeg;base64,' + base64.b64encode(
+        make_image().read()
+    ).decode()
+
+
+def make_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password='password', first_name='Имя', last_name='Фамилия'
+    )
+
+
+def make_recipe(author, name, tags=(), ingredients=()):
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание', cooking_time=10,
+        image=make_image()
+    )
+    recipe.tags.set(tags)
+    RecipeIngredients.objects.bulk_create(
+        RecipeIngredients(recipe=recipe, ingredient=ingredient, amount=10)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+def make_catalogue():
+    tags = [
+        Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                           slug=f'tag-{number}')
+        for number in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(name=name, measurement_unit=unit)
+        for name, unit in (('абрикос', 'г'), ('яблоко', 'шт'),
+                           ('молоко', 'мл'), ('мука', 'г'),
+                           ('сахар', 'г'))
+    ]
+    return tags, ingredients
+
+
+def get_client(user=None):
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+class CacheTestCase(TestCase):
+    """Тест с чистым кешем: поколения и версии индексов хранятся в нем."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()